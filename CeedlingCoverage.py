@@ -0,0 +1,237 @@
+import os
+import threading
+import time
+
+import sublime
+import sublime_plugin
+
+from .CeedlingSettings import CeedlingProjectSettings
+from .CeedlingSettings import CeedlingUserSettings
+from .CeedlingTiming import module_loaded
+
+# Minimum seconds between searches of build_root for new gcov files
+REFRESH_INTERVAL = 5.0
+
+REGIONS = (
+    ("ceedling_covered", "region.greenish"),
+    ("ceedling_uncovered", "region.redish"),
+)
+
+
+def _key(path):
+    return os.path.normcase(os.path.realpath(path))
+
+
+def read_gcov(path, working_dir):
+    """Return (source, covered lines, uncovered lines) of a gcov file.
+
+    The file is read a line at a time, so large reports are never held
+    in memory. Lines are numbered from 1.
+    """
+    source = None
+    covered = set()
+    uncovered = set()
+
+    with open(path, "r", errors="replace") as f:
+        for line in f:
+            parts = line.split(":", 2)
+
+            if len(parts) < 3:
+                continue
+
+            count = parts[0].strip()
+
+            try:
+                number = int(parts[1])
+            except ValueError:
+                continue
+
+            if number == 0:
+                if parts[2].startswith("Source:"):
+                    source = _key(
+                        os.path.join(working_dir, parts[2][7:].strip())
+                    )
+
+            elif count in ("#####", "====="):
+                uncovered.add(number)
+
+            elif count != "-":
+                covered.add(number)
+
+    return source, covered, uncovered
+
+
+class CeedlingCoverage:
+    """Line coverage read from gcov files below the build root.
+
+    One instance is kept per project file. gcov files are parsed in the
+    background and parsed again only when their mtime changes. Coverage
+    of each source file is merged from all its gcov files into a dict,
+    so painting a view is a single lookup.
+    """
+
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._files = {}
+        self._sources = {}
+        self._refreshed = 0
+        self._refreshing = False
+
+    @classmethod
+    def get(cls, conf):
+        with cls._instances_lock:
+            coverage = cls._instances.get(conf.project_yml)
+
+            if coverage is None:
+                coverage = cls()
+                cls._instances[conf.project_yml] = coverage
+
+            return coverage
+
+    def lookup(self, path):
+        """Return (covered, uncovered) line sets of source file, or None."""
+        return self._sources.get(_key(path))
+
+    def refresh_async(self, conf, on_done, force=False):
+        """Read new and modified gcov files in the background.
+
+        on_done is called if coverage changed. Searches of build_root are
+        at most once every REFRESH_INTERVAL seconds, unless forced.
+        """
+        with self._lock:
+            if self._refreshing or (
+                not force and time.time() - self._refreshed < REFRESH_INTERVAL
+            ):
+                return
+            self._refreshing = True
+
+        def run():
+            try:
+                changed = self.refresh(conf)
+            finally:
+                with self._lock:
+                    self._refreshing = False
+                    self._refreshed = time.time()
+
+            if changed:
+                on_done()
+
+        sublime.set_timeout_async(run, 0)
+
+    def refresh(self, conf):
+        """Read new and modified gcov files, return True if any changed."""
+        build_root = os.path.join(conf.working_dir, conf.build_root)
+        files = {}
+        changed = False
+
+        for root, dirs, names in os.walk(build_root):
+            for name in names:
+                if not name.endswith(".gcov"):
+                    continue
+
+                path = os.path.join(root, name)
+
+                try:
+                    mtime = os.stat(path).st_mtime
+                except OSError:
+                    continue
+
+                cached = self._files.get(path)
+
+                if cached is None or cached[0] != mtime:
+                    try:
+                        cached = (mtime,) + read_gcov(path, conf.working_dir)
+                    except (IOError, OSError) as e:
+                        print("Ceedling: cannot read {}: {}".format(path, e))
+                        continue
+                    changed = True
+
+                files[path] = cached
+
+        if not changed and len(files) == len(self._files):
+            return False
+
+        sources = {}
+        for mtime, source, covered, uncovered in files.values():
+            if source is None:
+                continue
+
+            lines = sources.setdefault(source, (set(), set()))
+            lines[0].update(covered)
+            lines[1].update(uncovered)
+
+        for covered, uncovered in sources.values():
+            uncovered.difference_update(covered)
+
+        self._files = files
+        self._sources = sources
+        return True
+
+
+class CeedlingCoverageListener(sublime_plugin.EventListener):
+    """Paint coverage of source views when coverage is enabled."""
+
+    def on_activated_async(self, view):
+        self.update(view)
+
+    def on_post_window_command(self, window, command_name, args):
+        if (
+            command_name == "ceedling_settings"
+            and (args or {}).get("cmd") == "toggle_coverage"
+        ):
+            view = window.active_view()
+
+            if view is not None:
+                self.update(view, force=True)
+
+    def update(self, view, force=False):
+        window = view.window()
+
+        if window is None or view.file_name() is None:
+            return
+
+        if not CeedlingUserSettings().coverage:
+            self.erase(view)
+            return
+
+        try:
+            conf = CeedlingProjectSettings(window, view.file_name())
+        except (IOError, OSError, KeyError):
+            return
+
+        coverage = CeedlingCoverage.get(conf)
+        self.paint(view, coverage.lookup(view.file_name()))
+        coverage.refresh_async(
+            conf,
+            lambda: self.paint(view, coverage.lookup(view.file_name())),
+            force,
+        )
+
+    def erase(self, view):
+        for key, scope in REGIONS:
+            view.erase_regions(key)
+
+    def paint(self, view, lines):
+        """Mark covered and uncovered lines in the gutter."""
+        self.erase(view)
+
+        if lines is None:
+            return
+
+        for (key, scope), numbers in zip(REGIONS, lines):
+            view.add_regions(
+                key,
+                [
+                    view.line(view.text_point(n - 1, 0))
+                    for n in sorted(numbers)
+                ],
+                scope,
+                "dot",
+                sublime.DRAW_NO_FILL | sublime.DRAW_NO_OUTLINE,
+            )
+
+
+module_loaded(__name__)
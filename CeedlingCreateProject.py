@@ -2,7 +2,14 @@ import functools
 import os
 import sublime
 import sublime_plugin
+from .CeedlingExec import run_ceedling
+from .CeedlingProjectData import MANAGED_KEY, folder_patterns
+from .CeedlingProjectData import sync_project_data
+from .CeedlingSettings import CeedlingProjectRegistry
+from .CeedlingSettings import CeedlingProjectSettings
 from .CeedlingSettings import CeedlingUserSettings
+from .CeedlingTiming import module_loaded
+
 
 # Taken from:
 # https://github.com/SublimeText/PackageDev/blob/master/plugins/create_package.py#L47
@@ -64,51 +71,67 @@ class CeedlingCreateProjectCommand(sublime_plugin.WindowCommand):
 
         window = view.window()
         window.status_message("Creating project: {}".format(project_name))
-        window.run_command(
-            "ceedling_exec",
+        on_finished = functools.partial(self.on_finished, window, pfolder)
+
+        started = run_ceedling(
+            window,
             {
                 "tasks": ["new", "{}".format(project_name)],
                 "options": options,
                 "working_dir": project_dir,
             },
+            on_finished,
         )
 
-        window.status_message("Created project: {}".format(project_name))
-
+        patterns = folder_patterns("")
         sublime.active_window().set_project_data(
             {
                 "folders": [
-                    {
-                        "name": project_name,
-                        "path": path,
-                        "binary_file_patterns": [
-                            "*.o",
-                            "*.elf",
-                            "*.hex",
-                            "*.out",
-                        ],
-                        "index_exclude_patterns": [
-                            "build/artifacts/*",
-                            "build/gcov/*",
-                            "build/logs/*",
-                            "build/temp/*",
-                            "build/test/*",
-                            "ceedling",
-                            "docs/CMock*.md",
-                            "docs/Ceedling*.md",
-                            "docs/ThrowTheSwitch*.md",
-                            "docs/Unity*.md",
-                            "docs/plugin_*.md",
-                            "project.yml",
-                            "test/simulation/*",
-                            "vendor/ceedling/*",
-                        ],
+                    dict(patterns, name=project_name, path=path),
+                ],
+                "settings": {
+                    MANAGED_KEY: {
+                        path: {
+                            os.path.realpath(
+                                os.path.join(pfolder, "project.yml")
+                            ): patterns,
+                        }
                     }
-                ]
+                },
             }
         )
 
+        # Ceedling could not be started
+        if not started:
+            on_finished(None)
+
+    def on_finished(self, window, pfolder, exit_code):
+        """Update project once Ceedling has created it."""
         # Windows/Linux need folder listing refresh
-        sublime.set_timeout_async(
-            lambda: window.run_command("refresh_folder_list"), 3500
-        )
+        window.run_command("refresh_folder_list")
+
+        project_name = os.path.basename(pfolder)
+
+        if exit_code != 0:
+            window.status_message(
+                "Ceedling: Creating project {} failed".format(project_name)
+            )
+            return
+
+        window.status_message("Created project: {}".format(project_name))
+
+        # folders searched before may now contain the project file
+        CeedlingProjectRegistry.forget_dirs()
+
+        try:
+            conf = CeedlingProjectSettings(
+                window, os.path.join(pfolder, "project.yml")
+            )
+        except (IOError, OSError, KeyError):
+            return
+
+        if CeedlingUserSettings().index_patterns:
+            sync_project_data(window, conf)
+
+
+module_loaded(__name__)
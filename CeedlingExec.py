@@ -1,20 +1,232 @@
 import sys
 import os
+import time
 
 import sublime
 import sublime_plugin
 
+# Import module, not class, so that "exec" is not registered again
+from Default import exec as default_exec
+
+from .CeedlingHistory import CeedlingHistory
+from .CeedlingIncludeGraph import CeedlingIncludeGraph
+from .CeedlingOpenFile import CeedlingPathBuilder
+from .CeedlingOutput import CeedlingOutputFilter
+from .CeedlingParallel import CeedlingShardRunner, shard
 from .CeedlingSettings import CeedlingProjectSettings
 from .CeedlingSettings import CeedlingUserSettings
+from .CeedlingTiming import CeedlingTimer, module_loaded, phase
+
+# Error navigation of the Ceedling build system
+FILE_REGEX = r"^\[(.*?)\]$"
+LINE_REGEX = r"At line\s\(([0-9]*)\)(\:?\s?(.*))?"
+
+
+class CeedlingRunCommand(default_exec.ExecCommand):
+    """Exec command which keeps track of its running process.
+
+    Each run is numbered so that callers can tell whether the process
+    they started is still running, and have a callback called when it
+    finishes. Outcomes of test runs are recorded in the test history
+    when the process finishes. With the "summary" output mode, output
+    passes through CeedlingOutputFilter.
+    """
+
+    _runs = 0
+    _running = {}
+    _callbacks = {}
+    _run_numbers = {}
+
+    @classmethod
+    def running(cls, window):
+        """Return number of run in progress in window, or None."""
+        return cls._running.get(window.id())
+
+    def run(self, **kwargs):
+        if kwargs.get("kill"):
+            CeedlingRunCommand._running.pop(self.window.id(), None)
+            run_number = CeedlingRunCommand._run_numbers.pop(
+                getattr(self, "proc", None), None
+            )
+            super().run(**kwargs)
+
+            # Sublime Text 3 forgets the process, so on_finished returns
+            # early for it
+            self._notify(run_number, None)
+            return
+
+        CeedlingRunCommand._runs += 1
+        self.run_number = CeedlingRunCommand._runs
+        self.tasks = [t for t in kwargs.get("cmd", []) if ":" in t]
+        self.working_dir = kwargs.get("working_dir")
+        self.start_time = time.time()
+
+        settings = CeedlingUserSettings()
+        self.output_filter = (
+            CeedlingOutputFilter(settings.output_max_lines)
+            if settings.output_mode == "summary"
+            else None
+        )
+
+        super().run(**kwargs)
+
+        if getattr(self, "proc", None) is not None:
+            CeedlingRunCommand._run_numbers[self.proc] = self.run_number
+            CeedlingRunCommand._running[self.window.id()] = self.run_number
+
+    def on_data(self, proc, data):
+        output_filter = getattr(self, "output_filter", None)
+
+        if output_filter is None:
+            super().on_data(proc, data)
+            return
+
+        if isinstance(data, bytes):
+            data = data.decode(getattr(self, "encoding", "utf-8"), "replace")
+
+        self._filtered_data(proc, output_filter.feed(data))
+
+    def _filtered_data(self, proc, text):
+        if not text:
+            return
+
+        # Sublime Text 3 passes undecoded output
+        if int(sublime.version()) < 4000:
+            text = text.encode(getattr(self, "encoding", "utf-8"))
+
+        super().on_data(proc, text)
+
+    def on_finished(self, proc):
+        output_filter = getattr(self, "output_filter", None)
+
+        if output_filter is not None and proc is self.proc:
+            self._filtered_data(proc, output_filter.finish())
+
+        super().on_finished(proc)
+
+        run_number = CeedlingRunCommand._run_numbers.pop(proc, None)
+        record = None
+
+        # exec leaves the process of a previous run running when a new
+        # run starts, and ignores it
+        if proc is self.proc:
+            CeedlingRunCommand._running.pop(self.window.id(), None)
+
+            if getattr(self, "killed", False):
+                self._notify(run_number, None)
+                return
+
+            if self.working_dir is not None and any(
+                t.startswith("test:") for t in self.tasks
+            ):
+                record = (
+                    self.tasks,
+                    self.working_dir,
+                    self.start_time,
+                    time.time() - self.start_time,
+                )
+
+        sublime.set_timeout_async(
+            lambda: self._exited(proc, run_number, record), 0
+        )
+
+    def _exited(self, proc, run_number, record):
+        # Output ends before the process exits, when its exit code is
+        # not known yet
+        exit_code = proc.proc.wait()
+
+        sublime.set_timeout(lambda: self._notify(run_number, exit_code), 0)
+
+        if record is not None:
+            self._record(*record, exit_code=exit_code)
+
+    def _notify(self, run_number, exit_code):
+        """Call callbacks waiting for a run to finish."""
+        callbacks = CeedlingRunCommand._callbacks.pop(run_number, [])
+
+        for callback in callbacks:
+            callback(exit_code)
+
+    def _record(self, tasks, working_dir, start_time, seconds, exit_code):
+        try:
+            # project of the run, not of the file active now
+            conf = CeedlingProjectSettings(
+                self.window, os.path.join(working_dir, "project.yml")
+            )
+        except (IOError, OSError, KeyError):
+            return
+
+        CeedlingHistory.get(conf).record(
+            conf, " ".join(tasks), start_time, seconds, exit_code
+        )
+
+
+def when_finished(window, callback):
+    """Call callback when the Ceedling run in progress in window exits.
+
+    callback is called with the exit code of the run, or None if it was
+    killed. Return False, and never call callback, if no run is in
+    progress.
+    """
+    runner = CeedlingShardRunner.running(window)
+
+    if runner is not None:
+        runner.callbacks.append(callback)
+        return True
+
+    run = CeedlingRunCommand.running(window)
+
+    if run is None:
+        return False
+
+    CeedlingRunCommand._callbacks.setdefault(run, []).append(callback)
+    return True
+
+
+def run_ceedling(window, args, on_finished):
+    """Run ceedling_exec command, then on_finished when Ceedling exits.
+
+    on_finished is called with the exit code of the process, or None if
+    it was killed. Return False, and never call on_finished, if no
+    process was started.
+    """
+    runs = CeedlingRunCommand._runs
+    window.run_command("ceedling_exec", args)
+    run = CeedlingRunCommand.running(window)
+
+    if run is None or run <= runs:
+        return False
+
+    CeedlingRunCommand._callbacks.setdefault(run, []).append(on_finished)
+    return True
 
 
 class CeedlingExecCommand(sublime_plugin.WindowCommand):
     def run(self, **kwargs):
+        with CeedlingTimer(
+            "exec {}".format(" ".join(kwargs.get("tasks", [])))
+        ):
+            self._run(**kwargs)
+
+    def _run(self, **kwargs):
+        # "cancel" of the build system
+        if kwargs.get("kill"):
+            CeedlingShardRunner.stop(self.window)
+            self.window.run_command("ceedling_run", {"kill": True})
+            return
+
+        parallel = kwargs.pop("parallel", False)
+        order = kwargs.pop("order", False)
+        path = kwargs.pop("file", None)
+        self._affected = None
+
         # "working_dir" is set by "new project" command.
         #  project.xml does not exist unit project is created.
         if kwargs.get("working_dir") is None:
             try:
-                self.conf = CeedlingProjectSettings(self.window)
+                with phase("config"):
+                    # project of file, if given, else of the active view
+                    self.conf = CeedlingProjectSettings(self.window, path)
 
             except OSError as e:
                 self.window.status_message("Ceedling: {}".format(e))
@@ -68,22 +280,146 @@ class CeedlingExecCommand(sublime_plugin.WindowCommand):
             for task in kwargs.pop("tasks", [])
         ]
 
+        # Replace pseudo task by tests affected by changes since last run,
+        # and test:all by test files to order them or split them between
+        # parallel workers.
+        tests = None
+        weights = None
+
+        if "test:affected" in task_sub:
+            pseudo_task = "test:affected"
+            with phase("affected"):
+                tests = self._affected_tests()
+
+        elif (
+            (order and "test:all" in task_sub)
+            or (parallel and task_sub == ["test:all"])
+        ) and hasattr(self, "conf"):
+            pseudo_task = "test:all"
+            tests = self._all_tests()
+
+        if tests is not None:
+            if not tests:
+                return
+
+            if order:
+                with phase("order"):
+                    tests, weights = CeedlingHistory.get(self.conf).schedule(
+                        tests
+                    )
+
+            i = task_sub.index(pseudo_task)
+            task_sub[i : i + 1] = [
+                "test:" + os.path.basename(t) for t in tests
+            ]
+
         # Build up the command line
         if sys.platform == "win32":
             cmd = ["ceedling.bat"]
         else:
             cmd = ["ceedling"]
 
-        for i in (
-            kwargs.pop("prefix", []),
-            task_sub,
-            kwargs.pop("options", []),
-        ):
+        prefix = kwargs.pop("prefix", [])
+        options = kwargs.pop("options", [])
+
+        for i in (prefix, task_sub, options):
             cmd.extend(i)
 
         kwargs["cmd"] = cmd
 
-        self.window.run_command("exec", kwargs)
-        self.window.find_output_panel("exec").settings().set(
-            "result_base_dir", test_dir
+        if parallel and tests and len(tests) == len(task_sub):
+            if parallel is True:
+                parallel = settings.parallel_workers
+
+            with phase("launch"):
+                self._run_parallel(
+                    cmd[:1] + prefix,
+                    options,
+                    shard(task_sub, parallel, weights),
+                    kwargs,
+                    test_dir,
+                )
+                self._mark_tested()
+            return
+
+        with phase("launch"):
+            self.window.run_command("ceedling_run", kwargs)
+            self.window.find_output_panel("exec").settings().set(
+                "result_base_dir", test_dir
+            )
+            self._mark_tested()
+
+    def _mark_tested(self):
+        """Record affected files as tested once the run succeeds.
+
+        Changes of a run which is cancelled or fails are still affected
+        on the next run.
+        """
+        if self._affected is None:
+            return
+
+        graph, snapshot = self._affected
+        self._affected = None
+
+        def on_finished(exit_code):
+            if exit_code == 0:
+                sublime.set_timeout_async(lambda: graph.mark_run(snapshot), 0)
+
+        when_finished(self.window, on_finished)
+
+    def _affected_tests(self):
+        """Return test files affected by changes since the last run."""
+        if not hasattr(self, "conf"):
+            return []
+
+        try:
+            pathbuilder = CeedlingPathBuilder(self.conf)
+            graph = CeedlingIncludeGraph.get(self.conf)
+            tests, snapshot = graph.affected(pathbuilder)
+
+        except IOError as e:
+            self.window.status_message("Ceedling: {}".format(e))
+            return []
+
+        if not tests:
+            self.window.status_message("Ceedling: No tests affected")
+            return []
+
+        self._affected = (graph, snapshot)
+        return tests
+
+    def _all_tests(self):
+        """Return all test files within the configured paths."""
+        try:
+            tests = CeedlingPathBuilder(self.conf).search("test", "*")
+
+        except IOError as e:
+            self.window.status_message("Ceedling: {}".format(e))
+            return []
+
+        if not tests:
+            self.window.status_message("Ceedling: No test files found")
+
+        return tests
+
+    def _run_parallel(self, cmd, options, shards, kwargs, test_dir):
+        """Run shards of test tasks in parallel workers."""
+        runner = CeedlingShardRunner(
+            self.window,
+            self.conf,
+            cmd,
+            shards,
+            options,
+            kwargs.get("env"),
+        )
+        runner.start(
+            {
+                "file_regex": kwargs.get("file_regex", ""),
+                "line_regex": kwargs.get("line_regex", ""),
+                "result_base_dir": test_dir,
+                "word_wrap": kwargs.get("word_wrap", True),
+            }
         )
+
+
+module_loaded(__name__)
@@ -0,0 +1,266 @@
+import collections
+import math
+import os
+import threading
+import time
+
+import sublime_plugin
+
+from .CeedlingResults import CeedlingResults
+from .CeedlingSettings import CeedlingProjectSettings
+from .CeedlingTiming import module_loaded
+
+HISTORY_FILE = "ceedling_history.tsv"
+
+# Number of failures kept for recent_failures
+RECENT_FAILURES = 100
+
+
+class CeedlingHistory:
+    """Outcomes and durations of test runs.
+
+    Runs are appended to a tab separated file in build_root, one line
+    per record:
+
+        time  R  seconds  exit code  tasks     - a ceedling run
+        time  F  seconds  test file             - a test file of a run
+        time  T  status   test file  test name  - a test of a test file
+
+    Aggregates for queries are kept in memory; only lines appended since
+    the file was last read are parsed.
+    """
+
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._offset = 0
+        self._files = {}
+        self._tests = {}
+        self._failures = collections.deque(maxlen=RECENT_FAILURES)
+
+    @classmethod
+    def get(cls, conf):
+        path = os.path.join(conf.working_dir, conf.build_root, HISTORY_FILE)
+
+        with cls._instances_lock:
+            history = cls._instances.get(path)
+
+            if history is None:
+                history = cls(path)
+                cls._instances[path] = history
+
+            return history
+
+    def record(self, conf, tasks, start, seconds, exit_code):
+        """Append run and results of test files written since start."""
+        now = "{:.0f}".format(time.time())
+        lines = [
+            "\t".join(
+                (now, "R", "{:.3f}".format(seconds), str(exit_code), tasks)
+            )
+        ]
+
+        for result in CeedlingResults.get(conf).since(conf, math.floor(start)):
+            lines.append(
+                "\t".join(
+                    (
+                        now,
+                        "F",
+                        "{:.3f}".format(float(result["time"] or 0)),
+                        result["file"],
+                    )
+                )
+            )
+            lines.extend(
+                "\t".join((now, "T", status, result["file"], str(name)))
+                for name, line, status, message in result["tests"]
+            )
+
+        with self._lock:
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                with open(self.path, "a") as f:
+                    f.write("\n".join(lines) + "\n")
+
+            except (IOError, OSError) as e:
+                print("Ceedling: history not written:", e)
+
+    def load(self):
+        """Read records appended since the last load."""
+        with self._lock:
+            try:
+                size = os.path.getsize(self.path)
+            except OSError:
+                size = 0
+
+            # File was removed, for example by clobber
+            if size < self._offset:
+                self._reset()
+
+            if size == self._offset:
+                return
+
+            with open(self.path, "rb") as f:
+                f.seek(self._offset)
+                data = f.read(size - self._offset)
+
+            # Leave an incomplete last line for the next load
+            end = data.rfind(b"\n") + 1
+            self._offset += end
+
+            for line in data[:end].decode("utf-8", "replace").splitlines():
+                try:
+                    self._add(line.split("\t"))
+                except ValueError:
+                    pass
+
+    def _add(self, record):
+        if len(record) < 4:
+            return
+
+        if record[1] == "F":
+            # runs, total seconds, failed in last run
+            stats = self._files.setdefault(record[3], [0, 0.0, False])
+            stats[0] += 1
+            stats[1] += float(record[2])
+            stats[2] = False
+
+        elif record[1] == "T" and len(record) >= 5:
+            status = record[2]
+            # runs, failures, changes between passed and failed, last status
+            stats = self._tests.setdefault(
+                (record[3], record[4]), [0, 0, 0, ""]
+            )
+            stats[0] += 1
+
+            if status == "failed":
+                stats[1] += 1
+                self._failures.append((int(record[0]), record[3], record[4]))
+
+                if record[3] in self._files:
+                    self._files[record[3]][2] = True
+
+            if status != "ignored":
+                if stats[3] and stats[3] != status:
+                    stats[2] += 1
+                stats[3] = status
+
+    def file_stats(self, test_file):
+        """Return (mean seconds, failed last) for test file, or None."""
+        self.load()
+
+        with self._lock:
+            stats = self._files.get(test_file)
+
+            if stats is None:
+                return None
+
+            return stats[1] / stats[0], stats[2]
+
+    def schedule(self, test_files):
+        """Return (test files, expected seconds) ordered for a test run.
+
+        Test files which failed in their last run come first, then files
+        without history, which are new and may fail, then the rest;
+        longest first within each group. Files without history are
+        expected to take the mean time of the others.
+        """
+        self.load()
+
+        with self._lock:
+            stats = {}
+            for path in test_files:
+                s = self._files.get(os.path.basename(path))
+                if s is not None:
+                    stats[path] = (s[1] / s[0], s[2])
+
+        known = [seconds for seconds, failed in stats.values()]
+        mean = sum(known) / len(known) if known else 1.0
+
+        def key(path):
+            if path not in stats:
+                return (1, -mean, path)
+            seconds, failed = stats[path]
+            return (0 if failed else 2, -seconds, path)
+
+        ordered = sorted(test_files, key=key)
+        return ordered, [stats.get(p, (mean,))[0] for p in ordered]
+
+    def slowest(self, count=10):
+        """Return [(test file, mean seconds)] of the slowest test files."""
+        self.load()
+
+        with self._lock:
+            return sorted(
+                ((f, s[1] / s[0]) for f, s in self._files.items()),
+                key=lambda r: -r[1],
+            )[:count]
+
+    def flakiest(self, count=10):
+        """Return [(test file, test, flip rate)] of the flakiest tests.
+
+        The flip rate is the fraction of runs whose outcome differed from
+        the previous run of the test.
+        """
+        self.load()
+
+        with self._lock:
+            return sorted(
+                (
+                    (f, t, s[2] / (s[0] - 1))
+                    for (f, t), s in self._tests.items()
+                    if s[2]
+                ),
+                key=lambda r: -r[2],
+            )[:count]
+
+    def recent_failures(self, count=10):
+        """Return [(time, test file, test)] of the latest failures."""
+        self.load()
+
+        with self._lock:
+            return list(reversed(self._failures))[:count]
+
+
+class CeedlingTestHistoryCommand(sublime_plugin.WindowCommand):
+    """Report slowest, flakiest and recently failed tests."""
+
+    def run(self):
+        try:
+            conf = CeedlingProjectSettings(self.window)
+        except (IOError, OSError, KeyError) as e:
+            self.window.status_message("Ceedling: {}".format(e))
+            return
+
+        history = CeedlingHistory.get(conf)
+        text = ["Slowest test files:"]
+        text.extend(
+            "  {:8.3f}s  {}".format(t, f) for f, t in history.slowest()
+        )
+        text.append("\nFlakiest tests:")
+        text.extend(
+            "  {:7.0%}  {}  {}".format(r, f, t)
+            for f, t, r in history.flakiest()
+        )
+        text.append("\nRecent failures:")
+        text.extend(
+            "  {}  {}  {}".format(
+                time.strftime("%Y-%m-%d %H:%M", time.localtime(ts)), f, t
+            )
+            for ts, f, t in history.recent_failures()
+        )
+
+        panel = self.window.create_output_panel("ceedling_history")
+        panel.run_command("append", {"characters": "\n".join(text) + "\n"})
+        self.window.run_command(
+            "show_panel", {"panel": "output.ceedling_history"}
+        )
+
+
+module_loaded(__name__)
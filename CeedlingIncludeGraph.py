@@ -0,0 +1,187 @@
+import hashlib
+import json
+import os
+import re
+import threading
+
+import sublime
+
+from .CeedlingTiming import module_loaded
+
+INCLUDE_PATTERN = rb'(?m)^[ \t]*#[ \t]*include[ \t]*[<"]([^>"]+)[>"]'
+
+
+def _cache_file(project_file):
+    """Return path of include graph cache for project file."""
+    return os.path.join(
+        sublime.cache_path(),
+        "Ceedling",
+        hashlib.sha1(project_file.encode("utf-8")).hexdigest() + ".deps.json",
+    )
+
+
+def parse_includes(path):
+    """Return list of file names included by path."""
+    with open(path, "rb") as f:
+        data = f.read()
+
+    return [
+        os.path.basename(m.decode("utf-8", "replace").replace("\\", "/"))
+        for m in re.findall(INCLUDE_PATTERN, data)
+    ]
+
+
+class CeedlingIncludeGraph:
+    """Include dependencies between test, source and header files.
+
+    One graph is kept per project file and saved in the Sublime Text
+    cache directory. Files are parsed again only when their modification
+    time changes. The modification times seen by the last test run are
+    kept to find the tests affected by files changed since.
+    """
+
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, project_file):
+        self.project_file = project_file
+        self._lock = threading.Lock()
+        self._files = {}
+        self._last_run = {}
+        self._load()
+
+    @classmethod
+    def get(cls, conf):
+        """Return include graph for project."""
+        with cls._instances_lock:
+            graph = cls._instances.get(conf.project_yml)
+
+            if graph is None:
+                graph = cls(conf.project_yml)
+                cls._instances[conf.project_yml] = graph
+
+            return graph
+
+    def _load(self):
+        try:
+            with open(_cache_file(self.project_file), "r") as f:
+                cached = json.load(f)
+
+            self._files = cached["files"]
+            self._last_run = cached["last_run"]
+
+        except (IOError, OSError, ValueError, KeyError, TypeError):
+            pass
+
+    def _save(self):
+        cache_file = _cache_file(self.project_file)
+
+        try:
+            os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+            with open(cache_file + ".tmp", "w") as f:
+                json.dump(
+                    {"files": self._files, "last_run": self._last_run}, f
+                )
+            os.replace(cache_file + ".tmp", cache_file)
+
+        except (IOError, OSError, TypeError, ValueError) as e:
+            print("Ceedling: include graph not written:", e)
+
+    def scan(self, pathbuilder):
+        """Update graph from project files, return {path: mtime}.
+
+        Only new files and files modified since the last scan are parsed.
+        """
+        current = {}
+
+        for option in ("test", "source", "header"):
+            for path in pathbuilder.isearch(option, "*"):
+                try:
+                    current[path] = os.stat(path).st_mtime
+                except OSError:
+                    pass
+
+        with self._lock:
+            files = {}
+
+            for path, mtime in current.items():
+                entry = self._files.get(path)
+
+                if entry is None or entry[0] != mtime:
+                    try:
+                        entry = [mtime, parse_includes(path)]
+                    except (IOError, OSError):
+                        continue
+
+                files[path] = entry
+
+            self._files = files
+            self._save()
+
+        return current
+
+    def affected(self, pathbuilder):
+        """Return (tests, snapshot) for files changed since last run.
+
+        tests - sorted list of test files to run
+        snapshot - file modification times to pass to mark_run
+        """
+        conf = pathbuilder.conf
+        snapshot = self.scan(pathbuilder)
+        tests = set(pathbuilder.search("test", "*"))
+
+        with self._lock:
+            last_run = self._last_run
+            changed = [p for p, m in snapshot.items() if last_run.get(p) != m]
+            changed.extend(p for p in last_run if p not in snapshot)
+
+            if not last_run:
+                return sorted(tests), snapshot
+
+            includers = {}
+            for path, (mtime, includes) in self._files.items():
+                for name in includes:
+                    includers.setdefault(name, set()).add(path)
+
+        header = "." + conf.header_ext
+        source = "." + conf.source_ext
+        mock_prefix = conf.mock_prefix
+        result = set()
+        seen = set(changed)
+        queue = list(changed)
+
+        while queue:
+            path = queue.pop()
+            name = os.path.basename(path)
+            stem, ext = os.path.splitext(name)
+
+            if path in tests:
+                result.add(path)
+
+            if ext == header:
+                # mocks are generated from the header
+                dependents = includers.get(name, set()) | includers.get(
+                    mock_prefix + name, set()
+                )
+            elif ext == source:
+                # source is linked into tests which include its header
+                dependents = set(
+                    p for p in includers.get(stem + header, ()) if p in tests
+                )
+            else:
+                dependents = set()
+
+            for dependent in dependents - seen:
+                seen.add(dependent)
+                queue.append(dependent)
+
+        return sorted(result & tests), snapshot
+
+    def mark_run(self, snapshot):
+        """Record file modification times seen by a test run."""
+        with self._lock:
+            self._last_run = snapshot
+            self._save()
+
+
+module_loaded(__name__)
@@ -0,0 +1,277 @@
+import os
+import threading
+
+import sublime
+import sublime_plugin
+
+from .CeedlingSettings import CeedlingProjectRegistry
+from .CeedlingTiming import module_loaded
+
+OPTIONS = ("test", "source", "header")
+
+# Number of files found between merges into a live index
+BATCH_SIZE = 500
+
+
+def _option(option):
+    """Return index key for a build_path option."""
+    return option if option in ("test", "source") else "header"
+
+
+class CeedlingModuleIndex:
+    """Map module base names to test, source and header paths.
+
+    One index is kept per project file. It is filled in the background
+    by a search of each configured path on first use and afterwards kept
+    current from view load/save events and side bar file operations.
+    """
+
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, last_modified):
+        self.last_modified = last_modified
+        self.built = False
+        self.building = False
+        self._lock = threading.Lock()
+        self._modules = {}
+        self._matcher = None
+        self._names = {}
+
+    @classmethod
+    def get(cls, conf):
+        """Return index for project, discarding it if project.yml changed."""
+        with cls._instances_lock:
+            index = cls._instances.get(conf.project_yml)
+
+            if index is None or index.last_modified != conf.last_modified:
+                index = cls(conf.last_modified)
+                cls._instances[conf.project_yml] = index
+
+            return index
+
+    @classmethod
+    def find(cls, project_file):
+        """Return existing index for project file, if any."""
+        with cls._instances_lock:
+            return cls._instances.get(project_file)
+
+    def build(self, pathbuilder):
+        """Populate index from a search of all configured paths."""
+        for option, root in self._start(pathbuilder):
+            self._index_root(pathbuilder, option, root)
+
+        self._finish()
+
+    def build_async(self, pathbuilder):
+        """Populate index in the background, one task per path root.
+
+        Does nothing if the index is built or being built. Progress is
+        shown in the status bar; until indexing finishes lookups only see
+        the modules found so far.
+        """
+        with self._lock:
+            if self.built or self.building:
+                return
+
+            # claim the build before releasing the lock
+            self.building = True
+
+        tasks = self._start(pathbuilder)
+
+        def run(i):
+            if i == len(tasks):
+                self._finish()
+                sublime.status_message(
+                    "Ceedling: indexed {} modules".format(len(self._modules))
+                )
+                return
+
+            option, root = tasks[i]
+            sublime.status_message(
+                "Ceedling: indexing {} ({}/{})".format(root, i + 1, len(tasks))
+            )
+
+            # continue with the next root whatever happens, so that the
+            # build always finishes
+            try:
+                self._index_root(pathbuilder, option, root)
+            except OSError as e:
+                print("Ceedling: indexing {} failed: {}".format(root, e))
+            finally:
+                sublime.set_timeout_async(lambda: run(i + 1), 0)
+
+        sublime.set_timeout_async(lambda: run(0), 0)
+
+    def _start(self, pathbuilder):
+        """Prepare index and return list of (option, path root) tasks.
+
+        Modules already recorded by update() are kept; the search adds
+        to them.
+        """
+        names = {}
+        tasks = []
+
+        for option in OPTIONS:
+            ext = pathbuilder.search_rules(option)[2]
+            prefix = (
+                pathbuilder.conf.test_file_prefix if option == "test" else ""
+            )
+            names[option] = (prefix, ext)
+            tasks.extend(
+                (option, root) for root in pathbuilder.matcher.roots(option)
+            )
+
+        with self._lock:
+            self._matcher = pathbuilder.matcher
+            self._names = names
+            self.building = True
+
+        return tasks
+
+    def _index_root(self, pathbuilder, option, root):
+        """Add module files for option found below a single path root."""
+        prefix, ext = self._names[option]
+        found = []
+
+        for path in pathbuilder.isearch(option, "*", roots=[root]):
+            base = self._module_name(path, prefix, ext)
+            if base is not None:
+                found.append((base, path))
+
+            if len(found) >= BATCH_SIZE:
+                self._merge(option, found)
+                found = []
+
+        self._merge(option, found)
+
+    def _merge(self, option, found):
+        """Add list of (base, path) for option to the index."""
+        with self._lock:
+            for base, path in found:
+                self._modules.setdefault(base, {}).setdefault(
+                    option, set()
+                ).add(path)
+
+    def _finish(self):
+        with self._lock:
+            self.built = True
+            self.building = False
+
+    def _module_name(self, path, prefix, ext):
+        """Return module base name for path or None if not a module file."""
+        name, file_ext = os.path.splitext(os.path.basename(path))
+
+        if file_ext != "." + ext or not name.startswith(prefix):
+            return None
+
+        return name[len(prefix) :] or None
+
+    def modules(self):
+        """Return sorted list of (base, options) of indexed modules."""
+        with self._lock:
+            return sorted(
+                (base, [o for o in OPTIONS if entry.get(o)])
+                for base, entry in self._modules.items()
+                if any(entry.values())
+            )
+
+    def lookup(self, option, base):
+        """Return list of existing indexed files for module."""
+        with self._lock:
+            paths = self._modules.get(base, {}).get(_option(option), ())
+            return sorted(p for p in paths if os.path.isfile(p))
+
+    def update(self, option, base, paths):
+        """Replace indexed files for module."""
+        with self._lock:
+            self._modules.setdefault(base, {})[_option(option)] = set(paths)
+
+    def update_file(self, path):
+        """Add or remove file according to project paths."""
+        self.update_files([path])
+
+    def update_files(self, paths):
+        """Add or remove files according to project paths."""
+        paths = [os.path.abspath(p) for p in paths]
+
+        with self._lock:
+            for path in paths:
+                for option, (prefix, ext) in self._names.items():
+                    base = self._module_name(path, prefix, ext)
+
+                    if base is None:
+                        continue
+
+                    if self._matcher.match(option, path) and os.path.isfile(
+                        path
+                    ):
+                        self._modules.setdefault(base, {}).setdefault(
+                            option, set()
+                        ).add(path)
+                    else:
+                        self._modules.get(base, {}).get(option, set()).discard(
+                            path
+                        )
+
+    def discard(self, paths):
+        """Remove files, or files within directories, from the index."""
+        paths = [os.path.abspath(p) for p in paths]
+        folders = tuple(os.path.join(p, "") for p in paths)
+
+        with self._lock:
+            for entry in self._modules.values():
+                for files in entry.values():
+                    for f in list(files):
+                        if f in paths or f.startswith(folders):
+                            files.discard(f)
+
+
+class CeedlingModuleIndexListener(sublime_plugin.EventListener):
+    """Keep module indexes current as files are opened, saved or removed."""
+
+    def _index(self, window, path):
+        if window is None or path is None:
+            return None
+
+        index = CeedlingModuleIndex.find(
+            CeedlingProjectRegistry.file_project(window, path)
+        )
+        return index if index is not None and index.built else None
+
+    def on_load_async(self, view):
+        self._update(view)
+
+    def on_post_save_async(self, view):
+        self._update(view)
+
+    def _update(self, view):
+        index = self._index(view.window(), view.file_name())
+
+        if index is not None:
+            index.update_file(view.file_name())
+
+    def on_post_window_command(self, window, command_name, args):
+        if command_name not in ("delete_file", "delete_folder", "rename_path"):
+            return
+
+        if args is None:
+            return
+
+        # paths may belong to different projects
+        projects = {}
+        for path in (
+            args.get("files", [])
+            + args.get("dirs", [])
+            + args.get("paths", [])
+        ):
+            index = self._index(window, path)
+
+            if index is not None:
+                projects.setdefault(index, []).append(path)
+
+        for index, paths in projects.items():
+            index.discard(paths)
+
+
+module_loaded(__name__)
@@ -1,17 +1,49 @@
 import functools
+import os
+import re
+import time
 
 import sublime
 import sublime_plugin
 
+from .CeedlingExec import run_ceedling
+from .CeedlingModuleIndex import CeedlingModuleIndex
 from .CeedlingOpenFile import CeedlingPathBuilder
 from .CeedlingSettings import CeedlingProjectSettings
+from .CeedlingTiming import module_loaded
+
+# Naming schemes accepted by module:create in place of a module name
+PATTERNS = ("src", "test", "mch", "mvp", "dhi", "dh")
+
+
+def module_args(text):
+    """Return module task arguments separated by commas, spaces or lines."""
+    return [arg for arg in re.split(r"[,\s]+", text) if arg]
+
+
+def module_names(args):
+    """Return base names of the modules named in module task arguments.
+
+    A module may be given as root:name or path/name; naming schemes
+    are skipped.
+    """
+    return [
+        os.path.basename(arg.split(":")[-1])
+        for arg in args
+        if arg not in PATTERNS
+    ]
 
 
 class CeedlingCreateModuleCommand(sublime_plugin.WindowCommand):
-    def run(self, action="create"):
+    """Create modules, or stubs, in a single Ceedling invocation.
+
+    Module names are given by the names argument or entered in an input
+    panel, separated by commas, spaces or new lines.
+    """
+
+    def run(self, action="create", names=None):
 
         window = self.window
-        view = self.window.active_view()
 
         if action == "create":
             desc = "Module"
@@ -20,34 +52,108 @@ class CeedlingCreateModuleCommand(sublime_plugin.WindowCommand):
         else:
             return
 
+        if names:
+            self.on_done(action, " ".join(names))
+            return
+
         window.show_input_panel(
-            "Enter new {} name".format(desc),
+            "Enter new {} names".format(desc),
             "",
-            functools.partial(self.on_done, view, action),
+            functools.partial(self.on_done, action),
             None,
             None,
         )
 
-    def on_done(self, view, module, text):
+    def on_done(self, module, text):
         """Handler for onDone event."""
-        window = view.window()
+        window = self.window
+        args = module_args(text)
+
+        if not module_names(args):
+            return
+
+        try:
+            conf = CeedlingProjectSettings(window)
+        except OSError as e:
+            window.status_message("Ceedling: %s" % e)
+            return
+
+        text = ", ".join(args)
         window.status_message("Creating {}: {}".format(module, text))
-        window.run_command(
-            "ceedling_exec", {"tasks": ["module:{}[{}]".format(module, text)]}
+        on_finished = functools.partial(
+            self.on_finished, window, conf, module, args, time.time()
         )
-        window.status_message("Created {}: {}".format(module, text))
 
+        if not run_ceedling(
+            window,
+            {"tasks": ["module:{}[{}]".format(module, ",".join(args))]},
+            on_finished,
+        ):
+            on_finished(None)
+
+    def on_finished(self, window, conf, module, args, start, exit_code):
+        """Show files created once Ceedling has finished."""
         # Windows/Linux need folder listing refresh
-        sublime.set_timeout_async(
-            lambda: window.run_command("refresh_folder_list"), 2000
-        )
+        window.run_command("refresh_folder_list")
+        text = ", ".join(args)
+
+        if exit_code != 0:
+            window.status_message(
+                "Ceedling: Creating {} {} failed".format(module, text)
+            )
+            return
+
+        names = module_names(args)
+        paths = self._created_files(conf, names, start)
+        index = CeedlingModuleIndex.find(conf.project_yml)
+
+        if index is not None:
+            index.update_files(paths)
+
+        # Open the files of a single module only
+        if len(names) == 1:
+            for path in paths:
+                window.open_file(path)
+
+        window.status_message("Created {}: {}".format(module, text))
+
+    def _created_files(self, conf, names, start):
+        """Return files of named modules modified since start."""
+        pathbuilder = CeedlingPathBuilder(conf)
+        paths = []
+
+        # One search of each path for all modules
+        for option in ("test", "source", "header"):
+            for path in pathbuilder.isearch(option, "*"):
+                base = pathbuilder.split_name(os.path.basename(path)).get(
+                    "base", ""
+                )
+
+                if base not in names:
+                    continue
+
+                try:
+                    # allow for file systems with coarse timestamps
+                    if os.stat(path).st_mtime >= start - 2:
+                        paths.append(path)
+                except OSError:
+                    pass
+
+        return sorted(set(paths))
 
 
 class CeedlingDestroyModuleCommand(sublime_plugin.WindowCommand):
-    def run(self, **kwargs):
+    """Destroy modules in a single Ceedling invocation.
+
+    Without arguments the module of the active file is destroyed. Module
+    names may be given by the names argument, or with prompt entered in
+    an input panel.
+    """
+
+    def run(self, names=None, prompt=False):
         variables = self.window.extract_variables()
 
-        if variables.get("file_name") is None:
+        if not names and not prompt and variables.get("file_name") is None:
             sublime.error_message("Nothing to destroy.")
             return None
 
@@ -59,44 +165,82 @@ class CeedlingDestroyModuleCommand(sublime_plugin.WindowCommand):
             self.window.status_message("Ceedling: %s" % e)
             return
 
-        base_name = self.pathbuilder.split_name(
-            variables.get("file_name", "")
-        ).get("base")
+        if prompt:
+            self.window.show_input_panel(
+                "Enter names of modules to destroy",
+                "",
+                lambda text: self._confirm(module_args(text)),
+                None,
+                None,
+            )
+            return
 
-        if base_name is None:
-            sublime.error_message("Cannot destroy selected file.")
-            return None
+        if not names:
+            base_name = self.pathbuilder.split_name(
+                variables.get("file_name", "")
+            ).get("base")
+
+            if base_name is None:
+                sublime.error_message("Cannot destroy selected file.")
+                return None
+
+            names = [base_name]
+
+        self._confirm(names)
+
+    def _confirm(self, args):
+        names = module_names(args)
+
+        if not names:
+            return
 
         if sublime.ok_cancel_dialog(
-            "Remove all test and source files for {}?".format(base_name),
+            "Remove all test and source files for {}?".format(
+                ", ".join(names)
+            ),
             ok_title="Destroy",
         ):
-            self._destroy(base_name)
-        else:
-            return None
+            self._destroy(args)
+
+    def _destroy(self, args):
+        paths = []
 
-    def _destroy(self, module_name):
         # Close all target module views without saving
-        for i in ("test", "source", "include"):
-            f = self.pathbuilder.build_path(i, module_name)
-            v = self.window.find_open_file(f)
-
-            if v is not None:
-                viewlist = self._find_clones(v)
-                viewlist.append(v)
-                for vi in viewlist:
-                    vi.set_scratch(True)
-                    vi.close()
-
-        self.window.run_command(
-            "ceedling_exec",
-            {"tasks": ["module:destroy[{}]".format(module_name)]},
-        )
+        for module_name in module_names(args):
+            for i in ("test", "source", "header"):
+                try:
+                    f = self.pathbuilder.build_path(i, module_name)
+                except IOError:
+                    continue
+
+                paths.append(f)
+                v = self.window.find_open_file(f)
+
+                if v is not None:
+                    viewlist = self._find_clones(v)
+                    viewlist.append(v)
+                    for vi in viewlist:
+                        vi.set_scratch(True)
+                        vi.close()
+
+        on_finished = functools.partial(self.on_finished, self.conf, paths)
 
+        if not run_ceedling(
+            self.window,
+            {"tasks": ["module:destroy[{}]".format(",".join(args))]},
+            on_finished,
+        ):
+            on_finished(None)
+
+    def on_finished(self, conf, paths, exit_code):
+        """Remove destroyed files once Ceedling has finished."""
         # Windows/Linux need folder listing refresh
-        sublime.set_timeout_async(
-            lambda: self.window.run_command("refresh_folder_list"), 2000
-        )
+        self.window.run_command("refresh_folder_list")
+
+        index = CeedlingModuleIndex.find(conf.project_yml)
+
+        if index is not None:
+            index.discard([p for p in paths if not os.path.exists(p)])
 
     def _find_clones(self, view):
         """Return view id of cloned windows."""
@@ -113,3 +257,6 @@ class CeedlingDestroyModuleCommand(sublime_plugin.WindowCommand):
                     ):
                         clones.append(_view)
             return clones
+
+
+module_loaded(__name__)
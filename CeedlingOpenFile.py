@@ -4,13 +4,16 @@ import itertools
 
 import sublime_plugin
 
+from .CeedlingModuleIndex import CeedlingModuleIndex
+from .CeedlingPathMatcher import CeedlingPathMatcher
 from .CeedlingSettings import CeedlingProjectSettings
-from . import glob2
+from .CeedlingTiming import CeedlingTimer, module_loaded, phase
 
 
 class CeedlingPathBuilder:
     def __init__(self, settings):
         self.conf = settings
+        self._matcher = None
 
     def split_name(self, filename):
         """Return dict of file name components."""
@@ -24,33 +27,74 @@ class CeedlingPathBuilder:
         )
         return {} if result is None else result.groupdict()
 
-    def build_path(self, option, base):
-        # todo: Check this assumption holds when env is set
-        working_dir = self.conf.working_dir
-        ext = self.conf.source_ext
+    def search_rules(self, option):
+        """Return included paths, excluded paths and extension for option."""
+        if option == "test":
+            return self.conf.test, self.conf.test_excl, self.conf.source_ext
+
+        elif option == "source":
+            return (
+                self.conf.source,
+                self.conf.source_excl,
+                self.conf.source_ext,
+            )
+
+        return (
+            self.conf.includes,
+            self.conf.includes_excl,
+            self.conf.header_ext,
+        )
+
+    @property
+    def matcher(self):
+        """Return matcher compiled from all configured paths."""
+        if self._matcher is None:
+            self._matcher = CeedlingPathMatcher(
+                self.conf.working_dir,
+                {
+                    option: self.search_rules(option)[:2]
+                    for option in ("test", "source", "header")
+                },
+            )
+        return self._matcher
+
+    def search(self, option, base, limit=None, roots=None):
+        """Return list of files for module base within configured paths.
+
+        With limit, the search stops once that many files are found.
+        roots restricts the search to some of the configured paths.
+        """
+        return sorted(
+            itertools.islice(self.isearch(option, base, roots), limit)
+        )
 
-        if working_dir is None:
+    def isearch(self, option, base, roots=None):
+        """Yield files for module base as they are found."""
+        # todo: Check this assumption holds when env is set
+        if self.conf.working_dir is None:
             raise IOError("missing path")
 
+        ext = self.search_rules(option)[2]
+
         if option == "test":
-            included = self.conf.test
-            excluded = self.conf.test_excl
             base = "".join((self.conf.test_file_prefix, base))
 
-        elif option == "source":
-            included = self.conf.source
-            excluded = self.conf.source_excl
+        # Build list of matching files within configured directories
+        return self._glob_search(option, base, ext, roots)
 
-        else:
-            included = self.conf.includes
-            excluded = self.conf.includes_excl
-            ext = self.conf.header_ext
+    def build_path(self, option, base):
+        with phase("lookup"):
+            index = CeedlingModuleIndex.get(self.conf)
+            index.build_async(self)
 
-        # Build list of matching files within configured directories
-        file_list = list(
-            self._glob_search(included, working_dir, base, ext)
-            - self._glob_search(excluded, working_dir, base, ext)
-        )
+            file_list = index.lookup(option, base)
+
+        # Fall back to a targeted search for files the index has not seen.
+        # A second match is enough to report duplicates.
+        if len(file_list) == 0:
+            with phase("search"):
+                file_list = self.search(option, base, limit=2)
+                index.update(option, base, file_list)
 
         if len(file_list) == 0:
             raise IOError("No matching file")
@@ -63,45 +107,69 @@ class CeedlingPathBuilder:
 
         return file_list[0]
 
-    def _glob_search(self, pattern, path, base, ext):
-        """Return set of files matching glob path.
+    def _glob_search(self, option, base, ext, roots=None):
+        """Yield each included, non-excluded file matching glob path once.
 
         Ceedling project.yml uses globstar `**` pattern.
         This is not supported by Python before v3.5.
         `glob2` module backports this functionality to earlier Python versions
         and is used to maintain Sublime Text 3 support.
+
+        Excluded paths are never searched: subtrees excluded by `**`
+        entries are pruned from the walk and the remaining results are
+        filtered by the compiled matcher. Matches are produced as the
+        walk finds them, so callers may stop early.
+
+        Directory listings are shared between searches through the
+        glob2 listing cache, which revalidates them by mtime.
         """
-        return set(
-            itertools.chain.from_iterable(
-                glob2.iglob(
-                    os.path.abspath(
-                        os.path.join(
-                            path,
-                            os.path.normpath(p),
-                            ".".join((base, ext)),
-                        )
-                    ),
-                    recursive=True,
-                )
-                for p in pattern
-            )
+        # Imported on first search rather than when the plugin is loaded
+        from . import glob2
+
+        matcher = self.matcher
+        globber = glob2.Globber(
+            prune=matcher.pruner(option), cache=glob2.listing_cache
         )
+        found = set()
+
+        for f in itertools.chain.from_iterable(
+            globber.iglob(
+                os.path.abspath(
+                    os.path.join(
+                        self.conf.working_dir,
+                        os.path.normpath(p),
+                        ".".join((base, ext)),
+                    )
+                ),
+                recursive=True,
+            )
+            for p in (matcher.roots(option) if roots is None else roots)
+        ):
+            if f not in found and not matcher.excluded(option, f):
+                found.add(f)
+                yield f
 
 
 class CeedlingOpenFileCommand(sublime_plugin.WindowCommand):
-    def run(self, option):
+    def run(self, option, module=None):
+        """Open files for module of the active view, or the named module."""
+        with CeedlingTimer("open_file {}".format(option)):
+            self._run(option, module)
+
+    def _run(self, option, module=None):
 
         self.views = []
         window = self.window
 
         variables = self.window.extract_variables()
 
-        if not self.window.active_view():
+        if module is None and not self.window.active_view():
             return
 
         try:
-            self.conf = CeedlingProjectSettings(self.window)
-            self.pathbuilder = CeedlingPathBuilder(self.conf)
+            with phase("config"):
+                self.conf = CeedlingProjectSettings(self.window)
+                self.pathbuilder = CeedlingPathBuilder(self.conf)
 
         except OSError as e:
             self.window.status_message("Ceedling: %s" % e)
@@ -111,7 +179,10 @@ class CeedlingOpenFileCommand(sublime_plugin.WindowCommand):
             return self._open_file(self.conf.project_yml)
 
         # Extract file name components
-        filename = self.pathbuilder.split_name(variables.get("file_name"))
+        if module is not None:
+            filename = {"base": module}
+        else:
+            filename = self.pathbuilder.split_name(variables.get("file_name"))
 
         if filename is None:
             self.window.status_message("Ceedling switching: unsupported file")
@@ -157,9 +228,71 @@ class CeedlingOpenFileCommand(sublime_plugin.WindowCommand):
             return
 
     def _open_file(self, file_path, auto_set_view=-1):
-        file_view = self.window.open_file(file_path)
+        with phase("open"):
+            file_view = self.window.open_file(file_path)
 
-        if auto_set_view >= 0:
-            self.window.run_command("move_to_group", {"group": auto_set_view})
+            if auto_set_view >= 0:
+                self.window.run_command(
+                    "move_to_group", {"group": auto_set_view}
+                )
 
         self.views.append(file_view)
+
+
+class CeedlingGotoModuleCommand(sublime_plugin.WindowCommand):
+    """Quick panel listing every module in the project index."""
+
+    def run(self):
+        try:
+            conf = CeedlingProjectSettings(self.window)
+            pathbuilder = CeedlingPathBuilder(conf)
+
+        except OSError as e:
+            self.window.status_message("Ceedling: %s" % e)
+            return
+
+        # List what is indexed so far rather than wait for the scan
+        index = CeedlingModuleIndex.get(conf)
+        index.build_async(pathbuilder)
+
+        self.modules = index.modules()
+        self.complete = index.built
+        items = [
+            [base, "Available: {}".format(", ".join(options))]
+            for base, options in self.modules
+        ]
+
+        if not self.complete:
+            items.insert(
+                0,
+                [
+                    "Refresh module list",
+                    "Indexing, {} modules found so far".format(
+                        len(self.modules)
+                    ),
+                ],
+            )
+
+        self.window.show_quick_panel(items, self.on_done)
+
+    def on_done(self, index):
+        if index == -1:
+            return
+
+        if not self.complete:
+            if index == 0:
+                self.window.run_command("ceedling_goto_module")
+                return
+            index -= 1
+
+        base, options = self.modules[index]
+        self.window.run_command(
+            "ceedling_open_file",
+            {
+                "option": "source" if "source" in options else options[0],
+                "module": base,
+            },
+        )
+
+
+module_loaded(__name__)
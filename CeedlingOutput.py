@@ -0,0 +1,128 @@
+import collections
+import re
+import threading
+
+from .CeedlingTiming import module_loaded
+
+# Progress messages, shell commands echoed by verbose output and passed
+# tests, which are folded into a count of lines
+NOISE_PATTERN = (
+    r"(?:(?P<step>Compiling|Linking|Running|Generating|Creating|Mocking"
+    r"|Preprocessing|Assembling|Testing|Building|Collecting|Determining"
+    r"|Processing|Loading|Cleaning)\b"
+    r"|(?P<command>> )"
+    r"|.*:(?P<passed>PASS)\s*$)"
+)
+
+# Compiler diagnostics and Ceedling's failure reports, which are always
+# shown; words like "error" in file names and flags are not diagnostics
+DIAGNOSTIC_PATTERN = (
+    r"\b(?:[Ee]rror|ERROR|[Ww]arning|WARNING|[Nn]ote):"
+    r"|:FAIL(?::.*)?$"
+    r"|^FAILED"
+    r"|^\s*Test:|At line|^\[.*\]\s*$"
+)
+
+# Lines kept from the end of output once the line limit is reached
+TAIL_LINES = 200
+
+
+class CeedlingOutputFilter:
+    """Fold noise out of Ceedling output and bound its size.
+
+    Text is fed as it arrives and the text to show is returned. Noise is
+    replaced by a line counting the folded lines. After max_lines lines
+    have been shown other lines are kept in a ring buffer, and the last
+    TAIL_LINES of them are shown ahead of the next diagnostic or by
+    finish, so diagnostics are never dropped and output stays in order.
+
+    exec feeds stdout and stderr from separate threads, so the state is
+    guarded by a lock.
+    """
+
+    def __init__(self, max_lines=10000):
+        self.max_lines = max_lines
+        self._lock = threading.Lock()
+        self._noise = re.compile(NOISE_PATTERN)
+        self._diagnostic = re.compile(DIAGNOSTIC_PATTERN)
+        self._partial = ""
+        self._shown = 0
+        self._blank = False
+        self._folded = collections.OrderedDict()
+        self._omitted = 0
+        self._tail = collections.deque(maxlen=TAIL_LINES)
+
+    def feed(self, text):
+        """Return text to show for newly received output."""
+        with self._lock:
+            lines = (self._partial + text).split("\n")
+            self._partial = lines.pop()
+
+            return "".join(self._filter(line) for line in lines)
+
+    def finish(self):
+        """Return text to show at the end of output."""
+        with self._lock:
+            out = self._filter(self._partial) if self._partial else ""
+            self._partial = ""
+
+            return out + self._fold_summary() + self._flush_tail()
+
+    def _flush_tail(self):
+        """Return lines held back since the line limit was reached."""
+        out = ""
+
+        if self._omitted > len(self._tail):
+            out += "({} lines omitted)\n".format(
+                self._omitted - len(self._tail)
+            )
+
+        if self._omitted:
+            out += "".join(line + "\n" for line in self._tail)
+            self._omitted = 0
+            self._tail.clear()
+
+        return out
+
+    def _fold_summary(self):
+        if not self._folded:
+            return ""
+
+        out = "({} lines folded: {})\n".format(
+            sum(self._folded.values()),
+            ", ".join("{} {}".format(k, v) for k, v in self._folded.items()),
+        )
+        self._folded.clear()
+        return out
+
+    def _filter(self, line):
+        match = self._noise.match(line)
+
+        if match is not None:
+            kind = match.lastgroup
+            if kind == "step":
+                kind = match.group("step")
+
+            self._folded[kind] = self._folded.get(kind, 0) + 1
+            return ""
+
+        # Collapse runs of blank lines
+        blank = not line.strip()
+        if blank and self._blank:
+            return ""
+        self._blank = blank
+
+        if self._shown < self.max_lines:
+            self._shown += 1
+            return self._fold_summary() + line + "\n"
+
+        if self._diagnostic.search(line) is not None:
+            self._shown += 1
+            return self._fold_summary() + self._flush_tail() + line + "\n"
+
+        self._omitted += 1
+        self._tail.append(line)
+        return ""
+
+
+module_loaded(__name__)
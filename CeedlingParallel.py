@@ -0,0 +1,277 @@
+import heapq
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+
+import sublime
+
+from .CeedlingHistory import CeedlingHistory
+from .CeedlingOutput import CeedlingOutputFilter
+from .CeedlingSettings import CeedlingUserSettings
+from .CeedlingTiming import module_loaded
+
+SUMMARY_PATTERN = r"(?m)^(TESTED|PASSED|FAILED|IGNORED):\s*(\d+)"
+
+
+def shard(items, count, weights=None):
+    """Split items into at most count non-empty shards.
+
+    Without weights items are dealt round robin. With weights, such as
+    expected durations, each item in turn goes to the lightest shard,
+    which balances shards best when items come heaviest first. Items
+    keep their order within each shard.
+    """
+    if weights is None:
+        return [s for s in (items[i::count] for i in range(count)) if s]
+
+    shards = [[] for i in range(min(count, len(items)))]
+    heap = [(0.0, i) for i in range(len(shards))]
+
+    for item, weight in zip(items, weights):
+        load, i = heapq.heappop(heap)
+        shards[i].append(item)
+        heapq.heappush(heap, (load + weight, i))
+
+    return shards
+
+
+def worker_project(conf, worker):
+    """Write worker.yml project file for worker, return its path.
+
+    Each worker builds below build_root/parallel so that concurrent
+    Ceedling processes never share object files, runners or results.
+    """
+    build_root = os.path.join(
+        conf.build_root, "parallel", "worker_{}".format(worker)
+    )
+
+    with open(conf.project_yml, "r") as f:
+        data = f.read()
+
+    data, count = re.subn(
+        # uncommented key only; \s could span from a blank line before
+        r"^([ \t]*:?build_root:[ \t]*).*$",
+        lambda m: m.group(1) + build_root.replace(os.sep, "/"),
+        data,
+        count=1,
+        flags=re.M,
+    )
+
+    if count == 0:
+        raise IOError("build_root is not set in project.yml")
+
+    # Not named project.yml, which would make files generated in the
+    # worker build root appear to belong to a project of their own
+    path = os.path.join(conf.working_dir, build_root, "worker.yml")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    with open(path, "w") as f:
+        f.write(data)
+
+    return path
+
+
+class CeedlingShardRunner:
+    """Run shards of test tasks in parallel Ceedling processes.
+
+    Each shard runs in its own process with an isolated build root.
+    Output of each worker is appended to the exec output panel as a block
+    when the worker exits, followed by a combined test summary. Callbacks
+    are then called with the exit code of the run, or None if it was
+    killed.
+    """
+
+    _running = {}
+
+    def __init__(self, window, conf, cmd, shards, options=None, env=None):
+        self.window = window
+        self.conf = conf
+        self.cmd = cmd
+        self.shards = shards
+        self.options = options or []
+        self.env = env or {}
+        self.procs = []
+        self.callbacks = []
+        self.killed = False
+        self._lock = threading.Lock()
+        self._finished = 0
+        self._failed = 0
+        self._totals = {}
+
+        settings = CeedlingUserSettings()
+        self.max_lines = (
+            settings.output_max_lines
+            if settings.output_mode == "summary"
+            else None
+        )
+
+    @classmethod
+    def running(cls, window):
+        """Return parallel run in progress in window, or None."""
+        return cls._running.get(window.id())
+
+    @classmethod
+    def stop(cls, window):
+        """Kill parallel run in window, return True if one was running."""
+        runner = cls._running.pop(window.id(), None)
+
+        if runner is None:
+            return False
+
+        runner.kill()
+        return True
+
+    def start(self, panel_settings):
+        CeedlingShardRunner.stop(self.window)
+        CeedlingShardRunner._running[self.window.id()] = self
+
+        self.panel = self.window.create_output_panel("exec")
+        settings = self.panel.settings()
+
+        for key, value in panel_settings.items():
+            settings.set(key, value)
+
+        self.window.run_command("show_panel", {"panel": "output.exec"})
+        self._append(
+            "Running {} test shards in parallel\n\n".format(len(self.shards))
+        )
+        self.start_time = time.time()
+
+        for worker, tasks in enumerate(self.shards, 1):
+            threading.Thread(
+                target=self._run_worker, args=(worker, tasks)
+            ).start()
+
+    def kill(self):
+        with self._lock:
+            self.killed = True
+            procs = list(self.procs)
+
+        for proc in procs:
+            if proc.poll() is None:
+                proc.kill()
+
+    def _append(self, text):
+        sublime.set_timeout(
+            lambda: self.panel.run_command(
+                "append",
+                {"characters": text, "force": True, "scroll_to_end": True},
+            ),
+            0,
+        )
+
+    def _popen(self, worker, tasks):
+        env = os.environ.copy()
+        env.update(self.env)
+        env["CEEDLING_MAIN_PROJECT_FILE"] = worker_project(self.conf, worker)
+
+        startupinfo = None
+        if sys.platform == "win32":
+            startupinfo = subprocess.STARTUPINFO()
+            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+
+        return subprocess.Popen(
+            self.cmd + tasks + self.options,
+            cwd=self.conf.working_dir,
+            env=env,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            startupinfo=startupinfo,
+        )
+
+    def _run_worker(self, worker, tasks):
+        try:
+            with self._lock:
+                if self.killed:
+                    raise OSError("worker not started, run was cancelled")
+                proc = self._popen(worker, tasks)
+                self.procs.append(proc)
+
+            output_filter = (
+                None
+                if self.max_lines is None
+                else CeedlingOutputFilter(self.max_lines)
+            )
+            chunks = []
+
+            for line in proc.stdout:
+                line = line.decode("utf-8", "replace").replace("\r\n", "\n")
+                chunks.append(
+                    line if output_filter is None else output_filter.feed(line)
+                )
+
+            if output_filter is not None:
+                chunks.append(output_filter.finish())
+
+            output = "".join(chunks)
+            returncode = proc.wait()
+
+        except (IOError, OSError) as e:
+            output = "{}\n".format(e)
+            returncode = -1
+
+        with self._lock:
+            self._finished += 1
+            self._failed += returncode != 0
+            finished = self._finished
+
+            # Last summary printed by each worker is its total
+            counts = dict(re.findall(SUMMARY_PATTERN, output))
+            for key, value in counts.items():
+                self._totals[key] = self._totals.get(key, 0) + int(value)
+
+        self._append(
+            "--- worker {} ({} tasks, exit code {}) ---\n{}\n".format(
+                worker, len(tasks), returncode, output
+            )
+        )
+        sublime.status_message(
+            "Ceedling: {}/{} test shards finished".format(
+                finished, len(self.shards)
+            )
+        )
+
+        if finished == len(self.shards):
+            self._finish()
+
+    def _finish(self):
+        if CeedlingShardRunner._running.get(self.window.id()) is self:
+            del CeedlingShardRunner._running[self.window.id()]
+
+        summary = "\n".join(
+            "{}: {}".format(key, self._totals.get(key, 0))
+            for key in ("TESTED", "PASSED", "FAILED", "IGNORED")
+        )
+
+        if not self.killed:
+            CeedlingHistory.get(self.conf).record(
+                self.conf,
+                " ".join(t for tasks in self.shards for t in tasks),
+                self.start_time,
+                time.time() - self.start_time,
+                1 if self._failed else 0,
+            )
+
+        exit_code = None if self.killed else 1 if self._failed else 0
+        for callback in self.callbacks:
+            sublime.set_timeout(lambda c=callback: c(exit_code), 0)
+
+        self._append(
+            "--- parallel summary ---\n{}\n\n"
+            "[Finished in {:.1f}s{}]\n".format(
+                summary,
+                time.time() - self.start_time,
+                (
+                    " with {} failed workers".format(self._failed)
+                    if self._failed
+                    else ""
+                ),
+            )
+        )
+
+
+module_loaded(__name__)
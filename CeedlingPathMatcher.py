@@ -0,0 +1,171 @@
+import os
+import re
+
+from .CeedlingTiming import module_loaded
+
+
+def _slashes(path):
+    """Return case normalised path using forward slashes."""
+    return os.path.normcase(path).replace(os.sep, "/")
+
+
+def _translate(component):
+    """Return regex matching a single path component glob.
+
+    Wildcards never cross directory separators and, like glob2,
+    do not match hidden names.
+    """
+    if component == "**":
+        return r"(?:/(?!\.)[^/]+)*"
+
+    res = ""
+    i, n = 0, len(component)
+    while i < n:
+        c = component[i]
+        i += 1
+        if c == "*":
+            res += "[^/]*"
+        elif c == "?":
+            res += "[^/]"
+        elif c == "[":
+            j = component.find("]", i + 1)
+            if j == -1:
+                res += r"\["
+            else:
+                stuff = component[i:j].replace("\\", "\\\\")
+                i = j + 1
+                if stuff.startswith("!"):
+                    stuff = "^" + stuff[1:]
+                res += "[{}]".format(stuff)
+        else:
+            res += re.escape(c)
+
+    if component[:1] in ("*", "?", "["):
+        res = r"(?!\.)" + res
+
+    return "/" + res
+
+
+def _is_recursive(pattern):
+    """Return True if pattern matches a directory and all descendants."""
+    return os.path.basename(os.path.normpath(pattern)) == "**"
+
+
+def _has_magic(pattern):
+    return re.search(r"[*?[]", pattern) is not None
+
+
+class CeedlingPathMatcher:
+    """Match file paths against project.yml path globs.
+
+    Ceedling path entries name directories; a file belongs to a
+    collection (test, source or header) when its parent directory
+    matches an included entry and no excluded entry. The entries of
+    each collection are compiled into one expression per kind.
+    """
+
+    def __init__(self, working_dir, rules):
+        """Compile rules, a dict of option: (included, excluded) paths."""
+        self.working_dir = working_dir
+        self._rules = {}
+
+        for option, (included, excluded) in rules.items():
+            included = included or []
+            excluded = excluded or []
+            self._rules[option] = (
+                self._compile(included),
+                self._compile(excluded),
+                self._compile([p for p in excluded if _is_recursive(p)]),
+                self._roots(included),
+            )
+
+    def _abspath(self, pattern):
+        return os.path.abspath(
+            os.path.join(self.working_dir, os.path.normpath(pattern))
+        )
+
+    def _regex(self, pattern):
+        drive, path = os.path.splitdrive(_slashes(self._abspath(pattern)))
+        res = re.escape(drive)
+
+        for component in path.strip("/").split("/"):
+            res += _translate(component)
+
+        return res
+
+    def _compile(self, patterns):
+        """Return match function for any of patterns, or None if empty."""
+        if not patterns:
+            return None
+
+        return re.compile(
+            "(?:{})\\Z".format("|".join(self._regex(p) for p in patterns))
+        ).match
+
+    def _roots(self, included):
+        """Return included paths, less those covered by a recursive entry.
+
+        Avoids searching the same subtree once per overlapping entry.
+        """
+        recursive = self._compile([p for p in included if _is_recursive(p)])
+        roots = []
+
+        for p in included:
+            if (
+                recursive is not None
+                and not _is_recursive(p)
+                and not _has_magic(p)
+                and recursive(_slashes(self._abspath(p)))
+            ):
+                continue
+
+            if p not in roots:
+                roots.append(p)
+
+        return roots
+
+    def roots(self, option):
+        """Return paths to search for option."""
+        return self._rules[option][3]
+
+    def excluded_dir(self, option, directory):
+        """Return True if directory is excluded for option."""
+        excluded = self._rules[option][1]
+        return excluded is not None and bool(
+            excluded(_slashes(os.path.abspath(directory)))
+        )
+
+    def excluded(self, option, path):
+        """Return True if file path is excluded for option."""
+        return self.excluded_dir(option, os.path.dirname(path))
+
+    def pruner(self, option):
+        """Return function testing if a directory subtree is excluded.
+
+        Only entries ending in `**` exclude a whole subtree; returns None
+        if no such entry is configured for option.
+        """
+        prune = self._rules[option][2]
+
+        if prune is None:
+            return None
+
+        return lambda directory: bool(prune(_slashes(directory)))
+
+    def match_dir(self, option, directory):
+        """Return True if files in directory belong to option."""
+        included, excluded = self._rules[option][:2]
+        directory = _slashes(os.path.abspath(directory))
+
+        return (
+            included is not None
+            and bool(included(directory))
+            and not (excluded is not None and excluded(directory))
+        )
+
+    def match(self, option, path):
+        """Return True if file path belongs to option."""
+        return self.match_dir(option, os.path.dirname(path))
+
+
+module_loaded(__name__)
@@ -0,0 +1,213 @@
+import os
+import posixpath
+
+import sublime_plugin
+
+from .CeedlingSettings import CeedlingProjectRegistry
+from .CeedlingSettings import CeedlingProjectSettings
+from .CeedlingSettings import CeedlingUserSettings
+from .CeedlingTiming import module_loaded
+
+# Files installed by "ceedling new", relative to the project directory
+CEEDLING_PATTERNS = (
+    "ceedling",
+    "docs/CMock*.md",
+    "docs/Ceedling*.md",
+    "docs/ThrowTheSwitch*.md",
+    "docs/Unity*.md",
+    "docs/plugin_*.md",
+    "project.yml",
+    "test/simulation/*",
+    "vendor/ceedling/*",
+)
+
+BINARY_PATTERNS = ("*.elf", "*.hex")
+
+# Project setting recording the patterns added by the plugin, so that
+# they can be replaced without touching patterns added by the user
+MANAGED_KEY = "ceedling_managed_patterns"
+
+
+def _glob_pattern(path):
+    """Return indexer pattern matching files below a project.yml path."""
+    pattern = path.replace("\\", "/").replace("**", "*").rstrip("/")
+
+    if not pattern.endswith("*"):
+        pattern += "/*"
+
+    return pattern
+
+
+def _folder_path(prefix, path):
+    """Return project path relative to the folder, or None if outside.
+
+    Indexer patterns are relative to the folder, so they cannot match
+    absolute paths, paths above the folder or the folder itself.
+    """
+    if os.path.isabs(path):
+        return None
+
+    path = posixpath.normpath(posixpath.join(prefix, path.replace("\\", "/")))
+
+    if path in (posixpath.curdir, posixpath.pardir) or path.startswith(
+        posixpath.pardir + "/"
+    ):
+        return None
+
+    return path
+
+
+def folder_patterns(
+    prefix,
+    build_root="build",
+    excluded=(),
+    object_ext=".o",
+    executable_ext=".out",
+):
+    """Return indexer patterns of a project within a window folder.
+
+    parameters: prefix - project directory relative to the folder
+                build_root - build directory of the project
+                excluded - source paths excluded in project.yml
+
+    The build directory, Ceedling's own files and source paths which
+    Ceedling does not build are excluded from indexing, unless they lie
+    outside the folder; objects and executables are marked binary.
+    """
+    index = []
+
+    for path in (build_root,) + tuple(excluded):
+        path = _folder_path(prefix, path)
+
+        if path is not None:
+            index.append(_glob_pattern(path))
+
+    prefix = "" if prefix in ("", os.curdir) else prefix + "/"
+    index.extend(prefix + p for p in CEEDLING_PATTERNS)
+
+    binary = []
+    for p in ("*" + object_ext, "*" + executable_ext) + BINARY_PATTERNS:
+        if p not in binary:
+            binary.append(p)
+
+    return {
+        "index_exclude_patterns": sorted(set(index)),
+        "binary_file_patterns": binary,
+    }
+
+
+def project_patterns(conf, folder):
+    """Return indexer patterns of project in folder, or None if outside."""
+    prefix = os.path.relpath(conf.working_dir, folder)
+
+    if prefix == os.pardir or prefix.startswith(os.pardir + os.sep):
+        return None
+
+    return folder_patterns(
+        prefix.replace(os.sep, "/"),
+        conf.build_root,
+        conf.source_excl + conf.includes_excl,
+        conf.object_ext,
+        conf.executable_ext,
+    )
+
+
+def sync_project_data(window, conf):
+    """Update indexer patterns of window folders containing the project.
+
+    Patterns added for the project before are replaced; patterns added
+    by the user or for other projects in the same folder are kept. The
+    project data is written only if it changed, as each write makes
+    Sublime Text reload the folders. Return True if it was written.
+    """
+    data = window.project_data() or {}
+    settings = data.setdefault("settings", {})
+    managed = settings.get(MANAGED_KEY, {})
+    changed = False
+
+    for entry, folder in zip(data.get("folders", []), window.folders()):
+        patterns = project_patterns(conf, folder)
+
+        if patterns is None:
+            continue
+
+        projects = managed.setdefault(entry.get("path", folder), {})
+        old = projects.get(conf.project_yml, {})
+
+        for key, values in patterns.items():
+            others = set()
+            for project_file, other in projects.items():
+                if project_file != conf.project_yml:
+                    others.update(other.get(key, ()))
+
+            current = entry.get(key, [])
+            stale = set(old.get(key, ())) - others - set(values)
+            updated = [p for p in current if p not in stale]
+            updated.extend(p for p in values if p not in updated)
+
+            if updated != current:
+                entry[key] = updated
+                changed = True
+
+        if old != patterns:
+            projects[conf.project_yml] = patterns
+            changed = True
+
+    if changed:
+        settings[MANAGED_KEY] = managed
+        window.set_project_data(data)
+
+    return changed
+
+
+class CeedlingProjectDataListener(sublime_plugin.EventListener):
+    """Keep indexer patterns of window folders in step with project.yml.
+
+    Patterns are synchronised once for each window and version of a
+    project file, when a file of the project is first activated and
+    whenever its project.yml is saved.
+    """
+
+    _synced = {}
+
+    def on_activated_async(self, view):
+        self._sync(view)
+
+    def on_post_save_async(self, view):
+        file_name = view.file_name()
+
+        if file_name is not None and os.path.basename(file_name) == (
+            "project.yml"
+        ):
+            # parse the saved file, whichever listener runs first
+            CeedlingProjectRegistry.invalidate(file_name)
+            self._sync(view)
+
+    def on_pre_close_window(self, window):
+        self._synced.pop(window.id(), None)
+
+    def _sync(self, view):
+        window = view.window()
+
+        if window is None or view.file_name() is None:
+            return
+
+        if not CeedlingUserSettings().index_patterns:
+            return
+
+        try:
+            conf = CeedlingProjectSettings(window, view.file_name())
+        except (IOError, OSError, KeyError):
+            return
+
+        synced = self._synced.setdefault(window.id(), set())
+        key = (conf.project_yml, conf.last_modified)
+
+        if key in synced:
+            return
+
+        synced.add(key)
+        sync_project_data(window, conf)
+
+
+module_loaded(__name__)
@@ -0,0 +1,278 @@
+import glob
+import html
+import os
+import threading
+
+import sublime
+import sublime_plugin
+
+from .CeedlingOpenFile import CeedlingPathBuilder
+from .CeedlingSettings import CeedlingProjectSettings, yaml_loader
+from .CeedlingTiming import module_loaded
+
+RESULT_EXTENSIONS = (".pass", ".fail")
+
+# Gutter regions per status: (region key, scope, icon)
+REGIONS = {
+    "failed": ("ceedling_failed", "region.redish", "circle"),
+    "ignored": ("ceedling_ignored", "region.yellowish", "dot"),
+    "passed": ("ceedling_passed", "region.greenish", "dot"),
+}
+
+
+def _strip_keys(data):
+    """Return data with Ruby symbol colons removed from mapping keys."""
+    if isinstance(data, dict):
+        return {
+            k.lstrip(":") if isinstance(k, str) else k: _strip_keys(v)
+            for k, v in data.items()
+        }
+
+    if isinstance(data, list):
+        return [_strip_keys(v) for v in data]
+
+    return data
+
+
+def read_result(path, source_ext):
+    """Return summary of a Ceedling test result file.
+
+    Result is a dict with file - test file name, counts - dict of test
+    counts, tests - list of (name, line, status, message) and time -
+    seconds taken by the test executable, if known.
+    """
+    yaml, loader = yaml_loader()
+
+    with open(path, "r") as f:
+        data = _strip_keys(yaml.load(f, Loader=loader)) or {}
+
+    tests = []
+    for key, status in (
+        ("failures", "failed"),
+        ("ignores", "ignored"),
+        ("successes", "passed"),
+    ):
+        for test in data.get(key) or []:
+            tests.append(
+                (
+                    test.get("test"),
+                    test.get("line"),
+                    status,
+                    test.get("message") or "",
+                )
+            )
+
+    test_file = (data.get("source") or {}).get("file")
+    if test_file is None:
+        test_file = "{}.{}".format(
+            os.path.splitext(os.path.basename(path))[0], source_ext
+        )
+
+    return {
+        "file": test_file,
+        "counts": data.get("counts") or {},
+        "tests": tests,
+        "time": data.get("time"),
+    }
+
+
+class CeedlingResults:
+    """Test results read from the result files in the build root.
+
+    One instance is kept per project file. Result files are read again
+    only when their modification time changes. Results of parallel
+    workers are included; the most recent result of a test file wins.
+    """
+
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._files = {}
+
+    @classmethod
+    def get(cls, conf):
+        with cls._instances_lock:
+            results = cls._instances.get(conf.project_yml)
+
+            if results is None:
+                results = cls()
+                cls._instances[conf.project_yml] = results
+
+            return results
+
+    def since(self, conf, start):
+        """Return list of results written at or after time start."""
+        self.update(conf)
+
+        with self._lock:
+            return [r for m, r in self._files.values() if m >= start]
+
+    def _result_files(self, conf):
+        build_root = os.path.join(conf.working_dir, conf.build_root)
+        dirs = [os.path.join(build_root, "test", "results")] + glob.glob(
+            os.path.join(build_root, "parallel", "*", "test", "results")
+        )
+
+        for d in dirs:
+            try:
+                names = os.listdir(d)
+            except OSError:
+                continue
+
+            for name in names:
+                if name.endswith(RESULT_EXTENSIONS):
+                    yield os.path.join(d, name)
+
+    def update(self, conf):
+        """Read new and modified result files, return {test file: result}."""
+        yaml = yaml_loader()[0]
+
+        with self._lock:
+            files = {}
+
+            for path in self._result_files(conf):
+                try:
+                    mtime = os.stat(path).st_mtime
+                except OSError:
+                    continue
+
+                cached = self._files.get(path)
+
+                if cached is None or cached[0] != mtime:
+                    try:
+                        cached = (mtime, read_result(path, conf.source_ext))
+
+                    except (IOError, OSError, yaml.YAMLError) as e:
+                        print("Ceedling: cannot read {}: {}".format(path, e))
+                        continue
+
+                files[path] = cached
+
+            self._files = files
+
+            results = {}
+            for mtime, result in sorted(files.values(), key=lambda f: f[0]):
+                results[result["file"]] = result
+
+            return results
+
+
+class CeedlingResultsListener(sublime_plugin.EventListener):
+    """Show results of the last run of a test file when it is activated."""
+
+    def on_activated_async(self, view):
+        window = view.window()
+        file_name = view.file_name()
+
+        if window is None or file_name is None:
+            return
+
+        try:
+            conf = CeedlingProjectSettings(window, file_name)
+            filename = CeedlingPathBuilder(conf).split_name(
+                os.path.basename(file_name)
+            )
+
+        except (IOError, OSError, KeyError):
+            return
+
+        if filename.get("prefix") != conf.test_file_prefix:
+            return
+
+        results = CeedlingResults.get(conf).update(conf)
+        self.show(view, results.get(os.path.basename(file_name)))
+
+    def show(self, view, result):
+        """Set status bar summary and gutter icons from test result."""
+        for key, scope, icon in REGIONS.values():
+            view.erase_regions(key)
+
+        if result is None:
+            view.erase_status("ceedling_results")
+            return
+
+        counts = result["counts"]
+        failed = [t[0] for t in result["tests"] if t[2] == "failed"]
+        view.set_status(
+            "ceedling_results",
+            "Ceedling: {} passed, {} failed, {} ignored{}".format(
+                counts.get("passed", 0),
+                counts.get("failed", 0),
+                counts.get("ignored", 0),
+                " ({})".format(", ".join(failed)) if failed else "",
+            ),
+        )
+
+        for status, (key, scope, icon) in REGIONS.items():
+            tests = [t for t in result["tests"] if t[2] == status and t[1]]
+            regions = [
+                view.line(view.text_point(int(t[1]) - 1, 0)) for t in tests
+            ]
+            flags = sublime.DRAW_NO_FILL | sublime.DRAW_NO_OUTLINE
+
+            # Annotations are available from Sublime Text 4
+            if status == "failed" and int(sublime.version()) >= 4050:
+                view.add_regions(
+                    key,
+                    regions,
+                    scope,
+                    icon,
+                    flags,
+                    annotations=[html.escape(t[3]) for t in tests],
+                )
+            else:
+                view.add_regions(key, regions, scope, icon, flags)
+
+
+class CeedlingTestResultsCommand(sublime_plugin.WindowCommand):
+    """List results of the last run of each test file."""
+
+    def run(self):
+        try:
+            conf = CeedlingProjectSettings(self.window)
+            pathbuilder = CeedlingPathBuilder(conf)
+
+        except (IOError, OSError, KeyError) as e:
+            self.window.status_message("Ceedling: {}".format(e))
+            return
+
+        results = sorted(
+            CeedlingResults.get(conf).update(conf).values(),
+            key=lambda r: (-r["counts"].get("failed", 0), r["file"]),
+        )
+
+        if not results:
+            self.window.status_message("Ceedling: No test results found")
+            return
+
+        def on_done(i):
+            if i != -1:
+                self.window.run_command(
+                    "ceedling_open_file",
+                    {
+                        "option": "test",
+                        "module": pathbuilder.split_name(
+                            results[i]["file"]
+                        ).get("base"),
+                    },
+                )
+
+        self.window.show_quick_panel(
+            [
+                [
+                    r["file"],
+                    "{} passed, {} failed, {} ignored".format(
+                        r["counts"].get("passed", 0),
+                        r["counts"].get("failed", 0),
+                        r["counts"].get("ignored", 0),
+                    ),
+                ]
+                for r in results
+            ],
+            on_done,
+        )
+
+
+module_loaded(__name__)
@@ -0,0 +1,172 @@
+import os
+import threading
+
+import sublime
+import sublime_plugin
+
+from .CeedlingExec import FILE_REGEX, LINE_REGEX
+from .CeedlingExec import CeedlingRunCommand, when_finished
+from .CeedlingOpenFile import CeedlingPathBuilder
+from .CeedlingSettings import CeedlingProjectSettings
+from .CeedlingSettings import CeedlingUserSettings
+from .CeedlingTiming import module_loaded
+
+
+class CeedlingSaveScheduler:
+    """Turn bursts of saves into a single test run per project.
+
+    Modules saved within the debounce delay of each other are tested
+    together once the saves stop, one run for each project, as a window
+    runs one build at a time. A run started by the scheduler which is
+    still in progress when the next run is due is stale: it is cancelled
+    and its modules are tested again with the new ones. Runs started by
+    the user are never cancelled; the next run waits for them to finish.
+    """
+
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, window):
+        self.window = window
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._generation = 0
+        self._in_flight = (None, None, set())
+
+    @classmethod
+    def get(cls, window):
+        with cls._instances_lock:
+            scheduler = cls._instances.get(window.id())
+
+            if scheduler is None:
+                scheduler = cls(window)
+                cls._instances[window.id()] = scheduler
+
+            return scheduler
+
+    @classmethod
+    def forget(cls, window):
+        with cls._instances_lock:
+            cls._instances.pop(window.id(), None)
+
+    def schedule(self, project_yml, module, delay):
+        """Queue test of module, to run delay ms after the last save."""
+        with self._lock:
+            self._pending.setdefault(project_yml, set()).add(module)
+            self._generation += 1
+            generation = self._generation
+
+        sublime.set_timeout(lambda: self._fire(generation), delay)
+
+    def _queue(self, pending):
+        with self._lock:
+            for project_yml, modules in pending.items():
+                self._pending.setdefault(project_yml, set()).update(modules)
+
+    def _fire(self, generation):
+        with self._lock:
+            # A later save has rescheduled the run
+            if generation != self._generation or not self._pending:
+                return
+
+            pending = self._pending
+            self._pending = {}
+
+        run, project_yml, in_flight = self._in_flight
+        running = CeedlingRunCommand.running(self.window)
+
+        if running is not None and running == run:
+            pending.setdefault(project_yml, set()).update(in_flight)
+            self.window.run_command("ceedling_run", {"kill": True})
+
+        elif when_finished(self.window, lambda exit_code: self._resume()):
+            self._queue(pending)
+            return
+
+        project_yml = min(pending)
+        modules = pending.pop(project_yml)
+        self._queue(pending)
+
+        self.window.run_command(
+            "ceedling_exec",
+            {
+                "tasks": ["test:{}".format(m) for m in sorted(modules)],
+                "file": project_yml,
+                "file_regex": FILE_REGEX,
+                "line_regex": LINE_REGEX,
+            },
+        )
+        self._in_flight = (
+            CeedlingRunCommand.running(self.window),
+            project_yml,
+            modules,
+        )
+
+        # Test other projects once this run finishes
+        if pending and not when_finished(
+            self.window, lambda exit_code: self._resume()
+        ):
+            self._resume()
+
+    def _resume(self):
+        """Run tests queued while another run was in progress."""
+        with self._lock:
+            generation = self._generation
+
+        self._fire(generation)
+
+
+class CeedlingTestOnSaveListener(sublime_plugin.EventListener):
+    """Test the module of a saved file when test_on_save is enabled."""
+
+    def on_post_save_async(self, view):
+        settings = CeedlingUserSettings()
+        window = view.window()
+
+        if not settings.test_on_save or window is None:
+            return
+
+        path = view.file_name()
+        if path is None:
+            return
+
+        try:
+            pathbuilder = CeedlingPathBuilder(
+                CeedlingProjectSettings(window, path)
+            )
+
+        except (IOError, OSError, KeyError):
+            return
+
+        filename = pathbuilder.split_name(os.path.basename(path))
+
+        if filename.get("prefix"):
+            option = "test"
+        elif filename.get("ext") == pathbuilder.conf.source_ext:
+            option = "source"
+        else:
+            option = "header"
+
+        module = filename.get("base")
+
+        if module is None or not pathbuilder.matcher.match(option, path):
+            return
+
+        try:
+            pathbuilder.build_path("test", module)
+
+        except IOError:
+            window.status_message("Ceedling: No test for {}".format(module))
+            return
+
+        CeedlingSaveScheduler.get(window).schedule(
+            pathbuilder.conf.project_yml,
+            module,
+            settings.test_on_save_delay,
+        )
+
+    def on_pre_close_window(self, window):
+        CeedlingSaveScheduler.forget(window)
+
+
+module_loaded(__name__)
@@ -1,24 +1,91 @@
+import hashlib
+import json
 import os
 import re
+import threading
+import time
 
-import yaml
 import sublime
 import sublime_plugin
 
+from .CeedlingTiming import module_loaded, phase
 
-def read_ruby_yaml(file):
+# Minimum seconds between checks of a cached project file for changes
+# made outside the editor
+STAT_INTERVAL = 2.0
+
+
+def yaml_loader():
+    """Return yaml module and its fastest safe loader.
+
+    yaml is imported on first use, when a project is found, rather than
+    when the plugin is loaded. LibYAML based loader is much faster, but
+    is not always available.
+    """
+    import yaml
+
+    return yaml, getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+def _yaml_cache_file(file):
+    """Return path of parsed section cache for project file."""
+    return os.path.join(
+        sublime.cache_path(),
+        "Ceedling",
+        hashlib.sha1(os.path.abspath(file).encode("utf-8")).hexdigest()
+        + ".json",
+    )
+
+
+def read_ruby_yaml(file, sections=None):
     """Read project.yml configuration file.
 
     parameters: project_file - path to project.yml
+                sections - optional list of top level sections to return
+
+    When sections are given, the result is cached on disk and reused
+    for as long as the file content hash is unchanged.
     """
     with open(file, "r") as f:
         data = f.read()
 
+    if sections is not None:
+        sections = sorted(sections)
+        digest = hashlib.sha1(
+            (repr(sections) + data).encode("utf-8")
+        ).hexdigest()
+        cache_file = _yaml_cache_file(file)
+
+        try:
+            with open(cache_file, "r") as f:
+                cached = json.load(f)
+
+            if cached.get("hash") == digest:
+                return cached["config"]
+
+        except (IOError, OSError, ValueError, KeyError, AttributeError):
+            pass
+
     # strip Ruby leading colons
     data = re.sub(r":([a-z])", r"\1", data)
     data = re.sub(r"([+-]):", r"\1", data)
 
-    return yaml.load(data, Loader=yaml.SafeLoader)
+    yaml, loader = yaml_loader()
+    config = yaml.load(data, Loader=loader)
+
+    if sections is not None and isinstance(config, dict):
+        config = {k: config[k] for k in sections if k in config}
+
+        try:
+            os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+            with open(cache_file + ".tmp", "w") as f:
+                json.dump({"hash": digest, "config": config}, f)
+            os.replace(cache_file + ".tmp", cache_file)
+
+        except (IOError, OSError, TypeError, ValueError) as e:
+            print("Ceedling: project cache not written:", e)
+
+    return config
 
 
 class CeedlingUserSettings:
@@ -60,6 +127,61 @@ class CeedlingUserSettings:
         self._settings.set("verbose", not self.verbose)
         self._write_settings()
 
+    @property
+    def timing(self):
+        return self._settings.get("timing", False)
+
+    @property
+    def timing_log(self):
+        return self._settings.get("timing_log", "")
+
+    def toggle_timing(self):
+        self._settings.set("timing", not self.timing)
+        self._write_settings()
+
+    @property
+    def test_on_save(self):
+        return self._settings.get("test_on_save", False)
+
+    @property
+    def test_on_save_delay(self):
+        return self._settings.get("test_on_save_delay", 500)
+
+    def toggle_test_on_save(self):
+        self._settings.set("test_on_save", not self.test_on_save)
+        self._write_settings()
+
+    @property
+    def coverage(self):
+        return self._settings.get("coverage", False)
+
+    def toggle_coverage(self):
+        self._settings.set("coverage", not self.coverage)
+        self._write_settings()
+
+    @property
+    def output_mode(self):
+        return self._settings.get("output_mode", "full")
+
+    @property
+    def output_max_lines(self):
+        return self._settings.get("output_max_lines", 10000)
+
+    @property
+    def index_patterns(self):
+        return self._settings.get("index_patterns", True)
+
+    @property
+    def parallel_workers(self):
+        workers = self._settings.get("parallel_workers", 0)
+
+        if not workers:
+            import multiprocessing
+
+            workers = multiprocessing.cpu_count()
+
+        return workers
+
 
 class CeedlingSettingsCommand(sublime_plugin.WindowCommand):
     def run(self, **kwargs):
@@ -76,14 +198,240 @@ class CeedlingSettingsCommand(sublime_plugin.WindowCommand):
         elif cmd == "toggle_verbose":
             settings.toggle_verbose()
 
+        elif cmd == "toggle_timing":
+            settings.toggle_timing()
+
+        elif cmd == "toggle_test_on_save":
+            settings.toggle_test_on_save()
+
+        elif cmd == "toggle_coverage":
+            settings.toggle_coverage()
+
+
+class CeedlingProjectRegistry:
+    """Process-wide cache of parsed project.yml models.
+
+    Models are keyed by resolved project file path and shared by every
+    window open on that project. A model is parsed on first use and
+    parsed again when the project file is saved in the editor, or when
+    its mtime has changed, which is checked at most once every
+    STAT_INTERVAL seconds.
+    """
+
+    _lock = threading.Lock()
+    _models = {}
+    _checked = {}
+    _folders = {}
+    _dirs = {}
+
+    @classmethod
+    def project_file(cls, window, path=None):
+        """Return project file for window.
+
+        The nearest project.yml in a directory above path, or above the
+        file of the active view, is used. Otherwise the project file is
+        located from the window folders, which is remembered until the
+        folders or CEEDLING_MAIN_PROJECT_FILE change.
+        """
+        env_project_file = os.getenv("CEEDLING_MAIN_PROJECT_FILE")
+        project_file = None
+
+        if env_project_file is None:
+            if path is None:
+                view = window.active_view()
+                path = view.file_name() if view is not None else None
+
+            if path is not None:
+                project_file = cls.nearest(path)
+
+        if project_file is None:
+            project_file = cls._folder_project(
+                window, (tuple(window.folders()), env_project_file)
+            )
+
+        return project_file
+
+    @classmethod
+    def nearest(cls, path):
+        """Return nearest project.yml in a directory above path, or None.
+
+        Results are remembered for every directory visited, so resolving
+        another file of the same tree takes a single lookup. Directories
+        without a project above are looked up again after STAT_INTERVAL
+        seconds, as a project file may be created outside the editor.
+        """
+        directory = os.path.dirname(os.path.abspath(path))
+        visited = []
+        now = time.time()
+
+        with cls._lock:
+            while True:
+                cached = cls._dirs.get(directory)
+
+                if cached is not None and (
+                    cached[0] is not None or now - cached[1] < STAT_INTERVAL
+                ):
+                    project_file = cached[0]
+                    break
+
+                visited.append(directory)
+                project_file = os.path.join(directory, "project.yml")
+
+                if os.path.isfile(project_file):
+                    project_file = os.path.realpath(project_file)
+                    break
+
+                parent = os.path.dirname(directory)
+                if parent == directory:
+                    project_file = None
+                    break
+
+                directory = parent
+
+            for directory in visited:
+                cls._dirs[directory] = (project_file, now)
+
+        return project_file
+
+    @classmethod
+    def _folder_project(cls, window, key):
+        with cls._lock:
+            cached = cls._folders.get(window.id())
+
+        if cached is not None and cached[0] == key:
+            return cached[1]
+
+        project_file = cls._locate(*key)
+
+        with cls._lock:
+            cls._folders[window.id()] = (key, project_file)
+
+        return project_file
+
+    @classmethod
+    def _locate(cls, folders, env_project_file):
+        """
+        Locate configuration based on Ceedling documentation.
+
+        To use a project file name other than the default project.yml
+        or place the project file in a directory other than the one
+        in which you'll run [ceedling], create an environment variable
+        CEEDLING_MAIN_PROJECT_FILE with your desired project file path.
+        """
+        if env_project_file is not None:
+            project_file = env_project_file
+
+        else:
+            for folder in folders:
+                project_file = os.path.join(folder, "project.yml")
+                if os.path.isfile(project_file):
+                    break
+            else:
+                raise IOError("Configuration file 'project.yml' not found.")
+
+        return os.path.realpath(project_file)
+
+    @classmethod
+    def file_project(cls, window, path):
+        """Return project file for path, or None if there is none."""
+        try:
+            return cls.project_file(window, path)
+        except (IOError, OSError):
+            return None
+
+    @classmethod
+    def model(cls, project_file, parse):
+        """Return model for project file, using parse to build it."""
+        with cls._lock:
+            model = cls._models.get(project_file)
+            now = time.time()
+
+            if (
+                model is not None
+                and now - cls._checked.get(project_file, 0) >= STAT_INTERVAL
+            ):
+                cls._checked[project_file] = now
+
+                try:
+                    mtime = os.stat(project_file).st_mtime
+                except OSError:
+                    mtime = None
+
+                # changed outside the editor, for example by git
+                if mtime != model["last_modified"]:
+                    model = None
+
+            if model is None:
+                mtime = os.stat(project_file).st_mtime
+                model = parse(project_file)
+                model.update(
+                    {
+                        "last_modified": mtime,
+                        "project_file": project_file,
+                        "working_dir": os.path.dirname(project_file),
+                    }
+                )
+                cls._models[project_file] = model
+                cls._checked[project_file] = now
+                print("Project cache updated")
+
+            return model
+
+    @classmethod
+    def invalidate(cls, project_file):
+        """Discard model for project file, if one is cached."""
+        with cls._lock:
+            cls._models.pop(os.path.realpath(project_file), None)
+
+            # a project file may have been added
+            if os.path.basename(project_file) == "project.yml":
+                cls._dirs.clear()
+
+    @classmethod
+    def forget_dirs(cls):
+        """Discard remembered project files of directories."""
+        with cls._lock:
+            cls._dirs.clear()
+
+    @classmethod
+    def forget_window(cls, window):
+        with cls._lock:
+            cls._folders.pop(window.id(), None)
+
+
+class CeedlingProjectListener(sublime_plugin.EventListener):
+    """Invalidate cached project models when project files change."""
+
+    def on_post_save_async(self, view):
+        self._invalidate(view)
+
+    def on_reload_async(self, view):
+        self._invalidate(view)
+
+    def _invalidate(self, view):
+        if view.file_name() is not None:
+            CeedlingProjectRegistry.invalidate(view.file_name())
+
+    def on_post_window_command(self, window, command_name, args):
+        # project files may have been removed or moved
+        if command_name in ("delete_file", "delete_folder", "rename_path"):
+            CeedlingProjectRegistry.forget_dirs()
+
+    def on_pre_close_window(self, window):
+        CeedlingProjectRegistry.forget_window(window)
+
 
 class CeedlingProjectSettings:
     """project.yml configuration parser."""
 
-    def __init__(self, window):
-        """Initialise and update settings cache."""
-        self.settings = window.settings()
-        self._cache_update(window)
+    def __init__(self, window, path=None):
+        """Initialise from the shared project model.
+
+        The project is the nearest one above path, or above the active
+        file of window if path is not given.
+        """
+        self._model = {}
+        self._cache_update(window, path)
 
     @property
     def project_yml(self):
@@ -95,6 +443,11 @@ class CeedlingProjectSettings:
         """Return path to project directory."""
         return self._cache_get("working_dir")
 
+    @property
+    def last_modified(self):
+        """Return project.yml timestamp when settings were cached."""
+        return self._cache_get("last_modified")
+
     @property
     def build_root(self):
         """Return build folder path."""
@@ -147,58 +500,39 @@ class CeedlingProjectSettings:
         """Return configured header file extension."""
         return self._cache_get("header_ext")
 
+    @property
+    def object_ext(self):
+        """Return extension of object files, including the dot."""
+        return self._cache_get("object_ext", ".o")
+
+    @property
+    def executable_ext(self):
+        """Return extension of test executables, including the dot."""
+        return self._cache_get("executable_ext", ".out")
+
+    @property
+    def mock_prefix(self):
+        """Return prefix of CMock generated mock headers."""
+        return self._cache_get("mock_prefix", "mock_")
+
     @property
     def release_build(self):
         """Return configured header file extension."""
         return self._cache_get("release_build")
 
-    def _cache_set(self, data):
-        for k, v in data.items():
-            self.settings.set(k, v)
-
     def _cache_get(self, key, default=None):
-        c = self.settings.get(key, default)
+        c = self._model.get(key, default)
         return c if c is not None else default
 
-    def _cache_update(self, window):
-        """
-        Locate configuration based on Ceedling documentation.
+    def _cache_update(self, window, path=None):
+        """Load project model shared by all windows on the project."""
+        with phase("locate"):
+            project_file = CeedlingProjectRegistry.project_file(window, path)
 
-        To use a project file name other than the default project.yml
-        or place the project file in a directory other than the one
-        in which you'll run [ceedling], create an environment variable
-        CEEDLING_MAIN_PROJECT_FILE with your desired project file path.
-        """
-        if os.path.exists(self._cache_get("project_yml", default="")):
-            project_file = self.project_yml
-
-        elif os.getenv("CEEDLING_MAIN_PROJECT_FILE") is not None:
-            project_file = os.getenv("CEEDLING_MAIN_PROJECT_FILE")
-
-        else:
-            for folder in window.folders():
-                project_file = os.path.join(folder, "project.yml")
-                if os.path.isfile(project_file):
-                    break
-            else:
-                raise IOError("Configuration file 'project.yml' not found.")
-
-        # Update if cache is out of date or doesn't exist
-        project_timestamp = os.stat(project_file).st_mtime
-        cached_timestamp = self._cache_get("last_modified")
-
-        if (cached_timestamp is None) or (
-            project_timestamp > cached_timestamp
-        ):
-            self._cache_set(self._project_file_parse(project_file))
-            self._cache_set(
-                {
-                    "last_modified": project_timestamp,
-                    "project_file": project_file,
-                    "working_dir": os.path.dirname(project_file),
-                }
+        with phase("load"):
+            self._model = CeedlingProjectRegistry.model(
+                project_file, self._project_file_parse
             )
-            print("Project cache updated")
 
     def _project_file_parse(self, project_file):
         """Return project settings.
@@ -217,10 +551,18 @@ class CeedlingProjectSettings:
                 "test_file_prefix": "test_",
                 "release_build": False,
             },
-            "extension": {"source": "c", "header": "h"},
+            "extension": {
+                "source": "c",
+                "header": "h",
+                "object": ".o",
+                "executable": ".out",
+            },
         }
 
-        config = read_ruby_yaml(project_file)
+        with phase("yaml"):
+            config = read_ruby_yaml(
+                project_file, list(yml_default) + ["cmock"]
+            )
         project_settings = {}
 
         try:
@@ -263,4 +605,11 @@ class CeedlingProjectSettings:
             print("Key missing:\n", e)
             raise KeyError(e)
 
+        # optional section
+        cmock = config.get("cmock") or {}
+        project_settings["mock_prefix"] = cmock.get("mock_prefix")
+
         return project_settings
+
+
+module_loaded(__name__)
@@ -0,0 +1,161 @@
+import contextlib
+import os
+import threading
+import time
+
+_local = threading.local()
+_logger = None
+_log_file = None
+
+# Import time of each plugin module, in load order
+_startup = []
+_startup_clock = time.perf_counter()
+
+
+def _emit(message, log_file):
+    """Print message to console, or append it to a rolling log file."""
+    global _logger, _log_file
+
+    if not log_file:
+        print(message)
+        return
+
+    import logging
+    import logging.handlers
+
+    if _logger is None:
+        _logger = logging.getLogger("Ceedling.timing")
+        _logger.propagate = False
+
+    log_file = os.path.abspath(os.path.expanduser(log_file))
+
+    if log_file != _log_file:
+        for handler in list(_logger.handlers):
+            _logger.removeHandler(handler)
+            handler.close()
+
+        handler = logging.handlers.RotatingFileHandler(
+            log_file, maxBytes=1024 * 1024, backupCount=3
+        )
+        handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+        _logger.addHandler(handler)
+        _logger.setLevel(logging.INFO)
+        _log_file = log_file
+
+    _logger.info(message)
+
+
+def module_loaded(name):
+    """Record import time of a plugin module; called at its end.
+
+    Plugin modules are imported one after another, so the time since
+    the previous module finished is the cost of this one, including
+    modules it imports first.
+    """
+    global _startup_clock
+
+    now = time.perf_counter()
+    _startup.append((name.rpartition(".")[2], now - _startup_clock))
+    _startup_clock = now
+
+
+def startup_time():
+    """Return total import time of plugin modules in seconds."""
+    return sum(seconds for name, seconds in _startup)
+
+
+def plugin_loaded():
+    """Report import time of plugin modules when timing is enabled."""
+    from .CeedlingSettings import CeedlingUserSettings
+
+    settings = CeedlingUserSettings()
+
+    if settings.timing:
+        _emit(
+            "Ceedling timing: startup {:.1f} ms [{}]".format(
+                startup_time() * 1000,
+                ", ".join(
+                    "{} {:.2f}".format(name, seconds * 1000)
+                    for name, seconds in _startup
+                ),
+            ),
+            settings.timing_log,
+        )
+
+
+@contextlib.contextmanager
+def phase(name):
+    """Time a phase of the command being timed on this thread, if any."""
+    timer = getattr(_local, "timer", None)
+
+    if timer is None:
+        yield
+    else:
+        with timer.phase(name):
+            yield
+
+
+class CeedlingTimer:
+    """Measure the duration of each phase of a command.
+
+    Used as a context manager around the command; phases are timed with
+    `phase` and reported when the command finishes. Nested phases are
+    reported as parent/child. Timing is enabled by the `timing` user
+    setting and reported to the console, or to the rolling log file set
+    by `timing_log`.
+    """
+
+    def __init__(self, name):
+        from .CeedlingSettings import CeedlingUserSettings
+
+        settings = CeedlingUserSettings()
+        self.name = name
+        self.enabled = settings.timing
+        self.log_file = settings.timing_log
+        self._phases = {}
+        self._stack = []
+
+    def __enter__(self):
+        if self.enabled:
+            self._parent = getattr(_local, "timer", None)
+            _local.timer = self
+            self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if self.enabled:
+            total = time.perf_counter() - self._start
+            _local.timer = self._parent
+            self.report(total)
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """Time a phase; repeated phases accumulate."""
+        if not self.enabled:
+            yield
+            return
+
+        self._stack.append(name)
+        key = "/".join(self._stack)
+        start = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            self._phases[key] = (
+                self._phases.get(key, 0.0) + time.perf_counter() - start
+            )
+            self._stack.pop()
+
+    def report(self, total):
+        _emit(
+            "Ceedling timing: {} {:.1f} ms [{}]".format(
+                self.name,
+                total * 1000,
+                ", ".join(
+                    "{} {:.2f}".format(k, v * 1000)
+                    for k, v in sorted(self._phases.items())
+                ),
+            ),
+            self.log_file,
+        )
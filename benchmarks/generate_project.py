@@ -0,0 +1,158 @@
+"""Generate synthetic Ceedling projects for benchmarking.
+
+usage: python generate_project.py PATH [--modules N] [--depth N] ...
+"""
+
+import argparse
+import os
+import random
+
+PROJECT_YML = """---
+:project:
+  :build_root: build
+  :test_file_prefix: test_
+  :release_build: FALSE
+
+:extension:
+  :executable: .out
+
+:paths:
+  :test:
+    - +:test/**
+    - -:test/support
+  :source:
+{source}
+  :support:
+    - test/support
+
+:defines:
+  :common: &common_defines
+{defines}
+  :test:
+    - *common_defines
+    - TEST
+
+:plugins:
+  :load_paths:
+    - vendor/ceedling/plugins
+  :enabled:
+    - stdout_pretty_tests_report
+    - module_generator
+"""
+
+
+def _tree(root, depth, fanout, rng):
+    """Return list of directories, fanout wide and up to depth deep."""
+    dirs = [root]
+    level = [root]
+
+    for d in range(depth):
+        level = [
+            os.path.join(parent, "d{}_{}".format(d, i))
+            for parent in level
+            for i in range(fanout)
+        ]
+        dirs.extend(level)
+
+    rng.shuffle(dirs)
+    return dirs
+
+
+def _touch(path, text=""):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(text)
+
+
+def generate(
+    root,
+    modules=200,
+    depth=2,
+    fanout=4,
+    excludes=("src/vendor/**",),
+    vendor=1000,
+    defines=100,
+    seed=0,
+):
+    """Create project below root and return list of module names.
+
+    modules - number of modules, each with test, source and header
+    depth, fanout - shape of directory trees below src/ and test/
+    excludes - source paths excluded in project.yml, filled with noise
+    vendor - number of noise files below each excluded path and below
+             vendor/ceedling, which is outside the configured paths
+    defines - number of entries in the :defines: section
+    """
+    rng = random.Random(seed)
+    names = ["module_{:05d}".format(i) for i in range(modules)]
+    src_dirs = _tree(os.path.join(root, "src"), depth, fanout, rng)
+    test_dirs = _tree(os.path.join(root, "test"), depth, fanout, rng)
+
+    for i, name in enumerate(names):
+        src = src_dirs[i % len(src_dirs)]
+        _touch(
+            os.path.join(src, name + ".c"), '#include "{}.h"\n'.format(name)
+        )
+        _touch(os.path.join(src, name + ".h"), "#pragma once\n")
+        _touch(
+            os.path.join(test_dirs[i % len(test_dirs)], "test_" + name + ".c"),
+            '#include "unity.h"\n#include "{}.h"\n'.format(name),
+        )
+
+    noise_roots = [
+        os.path.join(root, p.replace("**", "").rstrip("/*")) for p in excludes
+    ]
+    noise_roots.append(os.path.join(root, "vendor", "ceedling"))
+
+    for noise_root in noise_roots:
+        noise_dirs = _tree(noise_root, depth + 1, fanout, rng)
+        for i in range(vendor):
+            base = "noise_{:05d}".format(i)
+            _touch(os.path.join(noise_dirs[i % len(noise_dirs)], base + ".c"))
+            _touch(os.path.join(noise_dirs[i % len(noise_dirs)], base + ".h"))
+
+    _touch(os.path.join(root, "test", "support", "test_support.c"))
+
+    with open(os.path.join(root, "project.yml"), "w") as f:
+        f.write(
+            PROJECT_YML.format(
+                source="\n".join(
+                    ["    - src/**"] + ["    - -:" + p for p in excludes]
+                ),
+                defines="\n".join(
+                    "    - DEFINE_{}={}".format(i, i) for i in range(defines)
+                ),
+            )
+        )
+
+    return names
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path")
+    parser.add_argument("--modules", type=int, default=200)
+    parser.add_argument("--depth", type=int, default=2)
+    parser.add_argument("--fanout", type=int, default=4)
+    parser.add_argument(
+        "--exclude", action="append", help="excluded source path"
+    )
+    parser.add_argument("--vendor", type=int, default=1000)
+    parser.add_argument("--defines", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    generate(
+        args.path,
+        modules=args.modules,
+        depth=args.depth,
+        fanout=args.fanout,
+        excludes=args.exclude or ["src/vendor/**"],
+        vendor=args.vendor,
+        defines=args.defines,
+        seed=args.seed,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+"""Headless benchmarks for the Ceedling plugin lookup paths.
+
+usage: python benchmarks/run.py [--modules N] [--depth N] ...
+
+Generates a synthetic project in a temporary directory, imports the
+plugin against stub sublime modules and reports time and peak traced
+memory for each operation.
+"""
+
+import argparse
+import contextlib
+import importlib
+import importlib.machinery
+import importlib.util
+import io
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+
+sys.path.insert(0, os.path.join(HERE, "stubs"))
+sys.path.insert(0, HERE)
+
+import sublime  # noqa: E402
+from generate_project import generate  # noqa: E402
+
+
+def load_package(name="Ceedling"):
+    """Import plugin package from the repository under name."""
+    spec = importlib.machinery.ModuleSpec(name, None, is_package=True)
+    spec.submodule_search_locations = [ROOT]
+    sys.modules[name] = importlib.util.module_from_spec(spec)
+
+    return lambda module: importlib.import_module(name + "." + module)
+
+
+# Modules whose import is deferred until a Ceedling project is used
+DEFERRED_MODULES = ("yaml", "multiprocessing", "logging.handlers", "glob2")
+
+STARTUP_SCRIPT = """
+import sys, time
+sys.path[:0] = {paths!r}
+import run
+start = time.perf_counter()
+load = run.load_package()
+for module in run.plugin_modules():
+    load(module)
+print(time.perf_counter() - start)
+print(" ".join(
+    m for m in run.DEFERRED_MODULES
+    if m in sys.modules or "Ceedling." + m in sys.modules
+))
+"""
+
+
+def plugin_modules():
+    """Return names of plugin modules in the order Sublime Text loads them."""
+    return sorted(
+        os.path.splitext(f)[0]
+        for f in os.listdir(ROOT)
+        if f.endswith(".py") and not f.startswith("_")
+    )
+
+
+def measure(func, repeat=5, setup=None):
+    """Return (median seconds, peak KiB) of repeat calls of func.
+
+    Memory is traced in a separate call, as tracing slows execution.
+    """
+    times = []
+
+    for i in range(repeat + 1):
+        if setup is not None:
+            setup()
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            if i == 0:
+                tracemalloc.start()
+                func()
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            else:
+                start = time.perf_counter()
+                func()
+                times.append(time.perf_counter() - start)
+
+    return statistics.median(times), peak / 1024.0
+
+
+class Benchmarks:
+    def __init__(self, project, names, repeat, lookups):
+        plugin = load_package()
+        self.settings = plugin("CeedlingSettings")
+        self.openfile = plugin("CeedlingOpenFile")
+        self.index = plugin("CeedlingModuleIndex")
+        self.glob2 = plugin("glob2")
+
+        self.project = project
+        self.project_yml = os.path.join(project, "project.yml")
+        self.names = random.Random(1).sample(names, min(lookups, len(names)))
+        self.repeat = repeat
+        self.window = sublime.Window([project])
+
+    def _conf(self):
+        return self.settings.CeedlingProjectSettings(self.window)
+
+    def _pathbuilder(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return self.openfile.CeedlingPathBuilder(self._conf())
+
+    def _cold(self):
+        """Drop every in-process and on-disk cache."""
+        self.settings.CeedlingProjectRegistry._models.clear()
+        self.index.CeedlingModuleIndex._instances.clear()
+        self.glob2.listing_cache.clear()
+        shutil.rmtree(
+            os.path.join(sublime.cache_path(), "Ceedling"), ignore_errors=True
+        )
+
+    def bench_read_ruby_yaml(self):
+        path = self.project_yml
+        read = self.settings.read_ruby_yaml
+        yield "read_ruby_yaml (full parse)", measure(
+            lambda: read(path), self.repeat
+        )
+        yield "read_ruby_yaml (cold, sections)", measure(
+            lambda: read(path, ["paths", "project", "extension"]),
+            self.repeat,
+            setup=self._cold,
+        )
+        yield "read_ruby_yaml (cached sections)", measure(
+            lambda: read(path, ["paths", "project", "extension"]),
+            self.repeat,
+        )
+
+    def bench_project_settings(self):
+        yield "CeedlingProjectSettings (cold)", measure(
+            self._conf, self.repeat, setup=self._cold
+        )
+        yield "CeedlingProjectSettings (warm)", measure(
+            self._conf, self.repeat
+        )
+
+    def bench_startup(self):
+        """Import all plugin modules in a fresh interpreter."""
+        script = STARTUP_SCRIPT.format(
+            paths=[HERE, os.path.join(HERE, "stubs")]
+        )
+        times = []
+
+        for i in range(self.repeat):
+            output = subprocess.check_output(
+                [sys.executable, "-c", script], universal_newlines=True
+            ).split("\n")
+            times.append(float(output[0]))
+
+        yield "plugin import ({} deferred loaded)".format(
+            len(output[1].split())
+        ), (statistics.median(times), 0.0)
+
+    def bench_split_name(self):
+        pathbuilder = self._pathbuilder()
+        files = ["test_{}.c".format(n) for n in self.names] + [
+            "{}.h".format(n) for n in self.names
+        ]
+        yield "split_name x{}".format(len(files)), measure(
+            lambda: [pathbuilder.split_name(f) for f in files], self.repeat
+        )
+
+    def bench_glob_search(self):
+        pathbuilder = self._pathbuilder()
+
+        def search():
+            for name in self.names:
+                pathbuilder.search("source", name)
+
+        yield "_glob_search x{} (cold listings)".format(
+            len(self.names)
+        ), measure(search, self.repeat, setup=self.glob2.listing_cache.clear)
+        yield "_glob_search x{} (cached listings)".format(
+            len(self.names)
+        ), measure(search, self.repeat)
+
+    def bench_walk(self):
+        globber = self.glob2.Globber()
+        calls = {"scandir": 0, "listdir": 0}
+
+        def counted(name, func):
+            def wrapper(path):
+                calls[name] += 1
+                return func(path)
+
+            return wrapper
+
+        if globber.scandir is not None:
+            globber.scandir = counted("scandir", os.scandir)
+        globber.listdir = counted("listdir", os.listdir)
+
+        result = measure(
+            lambda: list(globber.walk(self.project)),
+            1,
+            setup=lambda: calls.update(scandir=0, listdir=0),
+        )
+        yield "glob2 walk ({scandir} scandir, {listdir} listdir)".format(
+            **calls
+        ), result
+
+    def bench_index(self):
+        def build():
+            pathbuilder = self._pathbuilder()
+            self.index.CeedlingModuleIndex.get(pathbuilder.conf).build(
+                pathbuilder
+            )
+
+        yield "module index build (cold)", measure(
+            build, self.repeat, setup=self._cold
+        )
+
+    def bench_build_path(self):
+        pathbuilder = self._pathbuilder()
+        index = self.index.CeedlingModuleIndex.get(pathbuilder.conf)
+        index.build(pathbuilder)
+
+        def lookup():
+            for name in self.names:
+                for option in ("test", "source", "header"):
+                    pathbuilder.build_path(option, name)
+
+        yield "build_path x{} (indexed)".format(3 * len(self.names)), measure(
+            lookup, self.repeat
+        )
+
+    def run(self):
+        for name in sorted(dir(self)):
+            if name.startswith("bench_"):
+                for result in getattr(self, name)():
+                    yield result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--modules", type=int, default=500)
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--fanout", type=int, default=4)
+    parser.add_argument(
+        "--exclude", action="append", help="excluded source path"
+    )
+    parser.add_argument("--vendor", type=int, default=5000)
+    parser.add_argument("--defines", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--lookups", type=int, default=50)
+    parser.add_argument(
+        "--keep", metavar="PATH", help="generate project in PATH and keep it"
+    )
+    args = parser.parse_args()
+
+    project = args.keep or tempfile.mkdtemp(prefix="ceedling-project-")
+
+    try:
+        names = generate(
+            project,
+            modules=args.modules,
+            depth=args.depth,
+            fanout=args.fanout,
+            excludes=args.exclude or ["src/vendor/**"],
+            vendor=args.vendor,
+            defines=args.defines,
+        )
+
+        benchmarks = Benchmarks(project, names, args.repeat, args.lookups)
+
+        print(
+            "{:<48} {:>12} {:>12}".format("operation", "median ms", "peak KiB")
+        )
+        for name, (seconds, peak) in benchmarks.run():
+            print(
+                "{:<48} {:>12.3f} {:>12.1f}".format(name, seconds * 1e3, peak)
+            )
+
+    finally:
+        if args.keep is None:
+            shutil.rmtree(project, ignore_errors=True)
+
+        shutil.rmtree(sublime.cache_path(), ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
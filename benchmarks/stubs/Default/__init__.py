@@ -0,0 +1 @@
+"""Minimal stand-in for the Sublime Text `Default` package."""
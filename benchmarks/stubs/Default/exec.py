@@ -0,0 +1,16 @@
+"""Minimal stand-in for the Sublime Text `Default.exec` module."""
+
+import sublime_plugin
+
+
+class ExecCommand(sublime_plugin.WindowCommand):
+    proc = None
+
+    def run(self, **kwargs):
+        pass
+
+    def on_data(self, proc, data):
+        pass
+
+    def on_finished(self, proc):
+        pass
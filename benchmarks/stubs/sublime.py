@@ -0,0 +1,95 @@
+"""Minimal stand-in for the Sublime Text `sublime` module.
+
+Provides just enough of the API for the plugin modules to be imported
+and exercised outside the editor. Asynchronous callbacks run
+immediately.
+"""
+
+import os
+import tempfile
+
+_settings = {}
+_cache_path = tempfile.mkdtemp(prefix="ceedling-bench-")
+
+
+class Settings(dict):
+    def get(self, key, default=None):
+        return dict.get(self, key, default)
+
+    def set(self, key, value):
+        self[key] = value
+
+
+class Window:
+    _next_id = 1
+
+    def __init__(self, folders=()):
+        self._folders = list(folders)
+        self._settings = Settings()
+        self._id = Window._next_id
+        Window._next_id += 1
+
+    def id(self):
+        return self._id
+
+    def folders(self):
+        return self._folders
+
+    def settings(self):
+        return self._settings
+
+    def active_view(self):
+        return None
+
+    def status_message(self, msg):
+        pass
+
+    def extract_variables(self):
+        return {}
+
+    def project_data(self):
+        return {}
+
+
+def load_settings(name):
+    return _settings.setdefault(name, Settings())
+
+
+def save_settings(name):
+    pass
+
+
+def set_timeout(callback, delay=0):
+    callback()
+
+
+def set_timeout_async(callback, delay=0):
+    callback()
+
+
+def status_message(msg):
+    pass
+
+
+def error_message(msg):
+    print(msg)
+
+
+def cache_path():
+    return _cache_path
+
+
+def packages_path():
+    return os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+
+
+def version():
+    return "4000"
+
+
+def windows():
+    return []
+
+
+def active_window():
+    return Window()
@@ -0,0 +1,24 @@
+"""Minimal stand-in for the Sublime Text `sublime_plugin` module."""
+
+
+class EventListener:
+    pass
+
+
+class ViewEventListener:
+    def __init__(self, view):
+        self.view = view
+
+
+class ApplicationCommand:
+    pass
+
+
+class WindowCommand:
+    def __init__(self, window):
+        self.window = window
+
+
+class TextCommand:
+    def __init__(self, view):
+        self.view = view
@@ -16,7 +16,7 @@ try:
 except ImportError:
     from .compat import lru_cache
 
-__all__ = ["filter", "fnmatch", "fnmatchcase", "translate"]
+__all__ = ["filter", "ifilter", "fnmatch", "fnmatchcase", "translate"]
 
 
 def _norm_paths(path, norm_paths, sep):
@@ -82,15 +82,18 @@ def _compile_pattern(pat, case_sensitive):
 
 def filter(names, pat, norm_paths=True, case_sensitive=True, sep=None):
     """Return the subset of the list NAMES that match PAT."""
-    result = []
+    return list(ifilter(names, pat, norm_paths, case_sensitive, sep))
+
+
+def ifilter(names, pat, norm_paths=True, case_sensitive=True, sep=None):
+    """Yield the members of the iterable NAMES that match PAT."""
     pat = _norm_paths(pat, norm_paths, sep)
     match = _compile_pattern(pat, case_sensitive)
     for name in names:
         m = match(_norm_paths(name, norm_paths, sep))
         if m:
-            result.append((name,
-                           tuple(_norm_paths(p, norm_paths, sep) for p in m.groups())))
-    return result
+            yield (name,
+                   tuple(_norm_paths(p, norm_paths, sep) for p in m.groups()))
 
 
 def fnmatchcase(name, pat, case_sensitive=True):
@@ -5,7 +5,10 @@ from __future__ import absolute_import
 import sys
 import os
 import re
+import time
+from collections import OrderedDict
 from os.path import join
+from threading import Lock
 from . import fnmatch
 
 try:
@@ -14,36 +17,147 @@ except ImportError:
     imap = map
 
 
+class ListingCache(object):
+    """Bounded LRU cache of directory listings shared between globbers.
+
+    A listing is reused for as long as the directory's modification time
+    is unchanged, costing one ``stat`` instead of a full listing.
+    Listings of directories modified within the last ``racy`` seconds
+    are not stored, as further changes may not move a coarse mtime.
+    """
+
+    def __init__(self, maxsize=4096, racy=2.0):
+        self.maxsize = maxsize
+        self.racy = racy
+        self.hits = 0
+        self.misses = 0
+        self._listings = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, path, lister):
+        """Return listing of ``path``, calling ``lister(path)`` to
+        produce it if there is no valid cached copy.
+        """
+        try:
+            st = os.stat(path)
+        except os.error:
+            self.discard(path)
+            return None
+        mtime = getattr(st, 'st_mtime_ns', st.st_mtime)
+
+        with self._lock:
+            cached = self._listings.pop(path, None)
+            if cached is not None and cached[0] == mtime:
+                self._listings[path] = cached
+                self.hits += 1
+                return cached[1]
+            self.misses += 1
+
+        listing = lister(path)
+        if listing is not None and time.time() - st.st_mtime > self.racy:
+            with self._lock:
+                self._listings[path] = (mtime, listing)
+                while len(self._listings) > self.maxsize:
+                    self._listings.popitem(last=False)
+        return listing
+
+    def discard(self, path):
+        with self._lock:
+            self._listings.pop(path, None)
+
+    def clear(self):
+        with self._lock:
+            self._listings.clear()
+            self.hits = self.misses = 0
+
+
 class Globber(object):
 
     listdir = staticmethod(os.listdir)
+    scandir = staticmethod(getattr(os, 'scandir', None))
     isdir = staticmethod(os.path.isdir)
     islink = staticmethod(os.path.islink)
     exists = staticmethod(os.path.lexists)
 
+    def __init__(self, prune=None, cache=None):
+        """If given, ``prune`` is called with each path found by a
+        ``**`` walk; paths for which it returns True are neither returned
+        nor descended into.
+
+        If given, directory listings are taken from the
+        :class:`ListingCache` ``cache``.
+        """
+        self.prune = prune
+        self.cache = cache
+
     def walk(self, top, followlinks=False, sep=None):
-        """A simplified version of os.walk (code copied) that uses
-        ``self.listdir``, and the other local filesystem methods.
+        """A simplified version of os.walk that uses ``self.scandir``
+        where available, falling back to ``self.listdir`` and the other
+        local filesystem methods.
 
         Because we don't care about file/directory distinctions, only
         a single list is returned.
+
+        Directories are visited top-down in the same order as a
+        recursive walk, but using an explicit stack rather than nested
+        generators.
+        """
+        stack = [top]
+        while stack:
+            top = stack.pop()
+            entries = self._entries(top)
+            if entries is None:
+                continue
+
+            items = []
+            subdirs = []
+            for name, isdir, islink in entries:
+                new_path = _join_paths([top, name], sep=sep)
+                if isdir is False:
+                    items.append(name)
+                    continue
+                if self.prune is not None and self.prune(new_path):
+                    continue
+                items.append(name)
+                if followlinks or not islink:
+                    subdirs.append(new_path)
+
+            yield top, items
+
+            stack.extend(reversed(subdirs))
+
+    def _entries(self, path):
+        """Return list of ``(name, isdir, islink)`` for entries in path,
+        or None if path cannot be listed.
+        """
+        if self.cache is not None:
+            return self.cache.get(path, self._scan_entries)
+        return self._scan_entries(path)
+
+    def _scan_entries(self, path):
+        """List path for :meth:`_entries`.
+
+        With ``os.scandir`` the entry types come from the directory
+        listing itself, so no further system calls are needed unless a
+        symlink must be resolved. Otherwise ``isdir`` is None (unknown:
+        listing it will be attempted) and ``islink`` costs a call per
+        entry.
         """
         try:
-            names = self.listdir(top)
-        except os.error as err:
-            return
-
-        items = []
-        for name in names:
-            items.append(name)
-
-        yield top, items
-
-        for name in items:
-            new_path = _join_paths([top, name], sep=sep)
-            if followlinks or not self.islink(new_path):
-                for x in self.walk(new_path, followlinks):
-                    yield x
+            if self.scandir is None:
+                return [(name, None, self.islink(_join_paths([path, name])))
+                        for name in self.listdir(path)]
+            entries = []
+            for entry in self.scandir(path):
+                islink = entry.is_symlink()
+                try:
+                    isdir = entry.is_dir()
+                except os.error:
+                    isdir = False
+                entries.append((entry.name, isdir, islink))
+            return entries
+        except os.error:
+            return None
 
     def glob(self, pathname, with_matches=False, include_hidden=False, recursive=True,
              norm_paths=True, case_sensitive=True, sep=None):
@@ -107,6 +221,20 @@ class Globber(object):
         # If no directory part is left, assume the working directory
         dirname, basename = os.path.split(pathname)
 
+        # Fast path for ``<literal dir>/**/<literal name>``: compare listed
+        # names with ``basename`` rather than matching every path below
+        # the directory against a regex and testing each for existence.
+        # Names are only compared case-insensitively where the platform
+        # folds case, so case-insensitive globs take the regular path.
+        parent, globstar = os.path.split(dirname)
+        if (case_sensitive and globstar == '**' and basename
+                and not isinstance(basename, bytes)
+                and not has_magic(basename) and not has_magic(parent)):
+            for match in self._iglob_name(parent, basename, include_hidden,
+                                          norm_paths, sep):
+                yield match
+            return
+
         # If the directory is globbed, recurse to resolve.
         # If at this point there is no directory part left, we simply
         # continue with dirname="", which will search the current dir.
@@ -129,6 +257,34 @@ class Globber(object):
                                                      norm_paths, case_sensitive, sep):
                 yield _join_paths([dirname, name], sep=sep), dir_groups + groups
 
+    def _iglob_name(self, dirname, name, include_hidden, norm_paths, sep):
+        """Yield ``(path, groups)`` for each entry called ``name`` found
+        in ``dirname`` or any directory below it.
+
+        Equivalent to resolving ``dirname/**/name``, but paths are only
+        built for matching entries.
+        """
+        top_dir = dirname or os.curdir
+        if os.path.normcase('A') == 'A':
+            target = name
+            fold = None
+        else:
+            target = os.path.normcase(name)
+            fold = os.path.normcase
+
+        for top, entries in self.walk(top_dir, sep=sep):
+            rel = top[len(top_dir) + 1:]
+            if rel and not include_hidden and _ishidden(rel):
+                continue
+            if fold is None:
+                found = target in entries
+            else:
+                found = any(fold(e) == target for e in entries)
+            if found:
+                yield (_join_paths([_join_paths([dirname, rel], sep=sep),
+                                    name], sep=sep),
+                       (fnmatch._norm_paths(rel, norm_paths, sep),))
+
     def resolve_pattern(self, dirname, pattern, globstar_with_root, include_hidden,
                         norm_paths, case_sensitive, sep):
         """Apply ``pattern`` (contains no path elements) to the
@@ -152,41 +308,59 @@ class Globber(object):
         if not has_magic(pattern):
             if pattern == '':
                 if self.isdir(dirname):
-                    return [(pattern, ())]
+                    yield pattern, ()
             else:
                 if self.exists(_join_paths([dirname, pattern], sep=sep)):
-                    return [(pattern, ())]
-            return []
+                    yield pattern, ()
+            return
 
         if not dirname:
             dirname = os.curdir
 
-        try:
-            if pattern == '**':
-                # Include the current directory in **, if asked; by adding
-                # an empty string as opposed to '.', we spare ourselves
-                # having to deal with os.path.normpath() later.
-                names = [''] if globstar_with_root else []
-                for top, entries in self.walk(dirname, sep=sep):
-                    _mkabs = lambda s: _join_paths([top[len(dirname) + 1:], s], sep=sep)
-                    names.extend(map(_mkabs, entries))
-                # Reset pattern so that fnmatch(), which does not understand
-                # ** specifically, will only return a single group match.
-                pattern = '*'
-            else:
+        if pattern == '**':
+            names = self._iglobstar(dirname, globstar_with_root, sep)
+            # Reset pattern so that fnmatch(), which does not understand
+            # ** specifically, will only return a single group match.
+            pattern = '*'
+        elif self.cache is not None:
+            entries = self._entries(dirname)
+            if entries is None:
+                return
+            names = [entry[0] for entry in entries]
+        else:
+            try:
                 names = self.listdir(dirname)
-        except os.error:
-            return []
+            except os.error:
+                return
 
         if not include_hidden and not _ishidden(pattern):
             # Remove hidden files, but take care to ensure
             # that the empty string we may have added earlier remains.
             # Do not filter out the '' that we might have added earlier
-            names = filter(lambda x: not x or not _ishidden(x), names)
-        return fnmatch.filter(names, pattern, norm_paths, case_sensitive, sep)
+            names = (x for x in names if not x or not _ishidden(x))
+        for match in fnmatch.ifilter(names, pattern, norm_paths,
+                                     case_sensitive, sep):
+            yield match
 
+    def _iglobstar(self, dirname, globstar_with_root, sep):
+        """Yield the path of everything below ``dirname``, relative to it,
+        as the walk reaches it.
 
-default_globber = Globber()
+        Matches are streamed rather than collected, so a caller that
+        stops early never pays for the rest of the walk.
+        """
+        # Include the current directory in **, if asked; by adding
+        # an empty string as opposed to '.', we spare ourselves
+        # having to deal with os.path.normpath() later.
+        if globstar_with_root:
+            yield ''
+        for top, entries in self.walk(dirname, sep=sep):
+            for entry in entries:
+                yield _join_paths([top[len(dirname) + 1:], entry], sep=sep)
+
+
+listing_cache = ListingCache(maxsize=16384)
+default_globber = Globber(cache=listing_cache)
 glob = default_globber.glob
 iglob = default_globber.iglob
 del default_globber